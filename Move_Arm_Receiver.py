@@ -5,7 +5,7 @@ from receiver_gui import RoboticArmIK  # Make sure receiver_gui.py is in the sam
 from LoginInformation import LoginInformation
 
 def main():
-    sm = SecurityManager()
+    sm = SecurityManager(public_only=True)  # verifying never needs the private key
 
     # Read encrypted data and signature
     try:
@@ -8,7 +8,7 @@ import tkinter as tk
 def main():
     # Initialize security manager
     """SecurityManager handles encryption, decryption, and signing of data."""
-    sm = SecurityManager()
+    sm = SecurityManager(background=True)  # private key loads while the user fills in the form
 
     # Collect login info
     login_info = LoginInformation()
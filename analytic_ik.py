@@ -0,0 +1,65 @@
+import math
+
+ELBOW_UP = 'up'
+ELBOW_DOWN = 'down'
+
+
+def workspace_annulus(num_segments, segment_length):
+    """Return (inner, outer) radii of the ring an equal-segment arm can reach."""
+    outer = num_segments * segment_length
+    # With equal segments only a single link leaves a hole around the base;
+    # two or more can fold back onto it.
+    inner = segment_length if num_segments == 1 else 0.0
+    return inner, outer
+
+
+def solve_one_segment(base, target, length):
+    """Point the single link at ``target``; returns the joint list."""
+    bx, by = base
+    dx = target[0] - bx
+    dy = target[1] - by
+    r = math.hypot(dx, dy)
+    if r == 0:
+        # Every direction is equally far from the base; keep +x.
+        return [[bx, by], [bx + length, by]]
+    return [[bx, by], [bx + length * dx / r, by + length * dy / r]]
+
+
+def solve_two_segment(base, target, length, elbow=None, current_elbow=None):
+    """Closed-form two-link solve with equal link lengths.
+
+    ``elbow`` selects ELBOW_UP (counter-clockwise of the base->target line)
+    or ELBOW_DOWN. When it is None the branch nearest ``current_elbow`` is
+    used so consecutive moves don't flip the arm. The target must lie within
+    reach (``2 * length``) of the base.
+    """
+    bx, by = base
+    tx, ty = target
+    dx = tx - bx
+    dy = ty - by
+    d = math.hypot(dx, dy)
+    if d == 0:
+        # Folded onto the base: any elbow direction works, so keep the
+        # current one when we have it.
+        if current_elbow is not None:
+            ex = current_elbow[0] - bx
+            ey = current_elbow[1] - by
+            r = math.hypot(ex, ey)
+            if r:
+                return [[bx, by], [bx + length * ex / r, by + length * ey / r], [tx, ty]]
+        return [[bx, by], [bx + length, by], [tx, ty]]
+
+    theta = math.atan2(dy, dx)
+    alpha = math.acos(min(1.0, d / (2 * length)))
+    up = [bx + length * math.cos(theta + alpha), by + length * math.sin(theta + alpha)]
+    down = [bx + length * math.cos(theta - alpha), by + length * math.sin(theta - alpha)]
+    if elbow == ELBOW_UP:
+        joint = up
+    elif elbow == ELBOW_DOWN:
+        joint = down
+    elif current_elbow is not None:
+        cx, cy = current_elbow
+        joint = up if math.hypot(up[0] - cx, up[1] - cy) <= math.hypot(down[0] - cx, down[1] - cy) else down
+    else:
+        joint = up
+    return [[bx, by], joint, [tx, ty]]
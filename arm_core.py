@@ -0,0 +1,529 @@
+"""Headless robotic arm simulation core.
+
+Holds the arm model, the command classes and a step-based executor. Nothing
+here configures logging, registers users or imports matplotlib at import
+time, so it is safe to use from batch workers; ``RoboticArm.draw`` draws on
+whatever canvas the axes belong to and never imports pyplot.
+"""
+import logging
+import math
+import time
+from collections import deque
+
+import numpy as np
+
+import metrics
+from batch_ik import solve_ik_batch
+from command_codec import encode_params, decode_message
+from crypto_session import CryptoSession, default_session
+from trajectory import LINEAR, TrajectoryFrame, sample_path
+from analytic_ik import ELBOW_UP, ELBOW_DOWN, workspace_annulus, solve_one_segment, solve_two_segment
+
+logger = logging.getLogger(__name__)
+
+# Constrained FABRIK gives up after this many passes without improvement.
+_CONSTRAINED_PATIENCE = 10
+
+
+class IKResult:
+    """Outcome of a single RoboticArm.solve_ik call."""
+
+    def __init__(self, target, reachable, converged, iterations, error, elapsed, binding=(), collision=False):
+        self.target = target
+        self.reachable = reachable
+        self.converged = converged
+        self.iterations = iterations
+        self.error = error
+        self.elapsed = elapsed
+        # Constraints the final pose rests against (see constraints.ArmConstraints.binding)
+        self.binding = list(binding)
+        self.collision = collision
+
+    def __repr__(self):
+        extra = f", binding={self.binding}, collision={self.collision}" if self.binding or self.collision else ""
+        return (f"IKResult(reachable={self.reachable}, converged={self.converged}, "
+                f"iterations={self.iterations}, error={self.error:.4g}, "
+                f"elapsed={self.elapsed * 1e3:.3f}ms{extra})")
+
+
+def _place(anchor, free, length, reference=None):
+    # Move `free` (an [x, y] list, updated in place) along the anchor->free
+    # line so it sits `length` away from `anchor`.
+    dx = free[0] - anchor[0]
+    dy = free[1] - anchor[1]
+    r = math.hypot(dx, dy)
+    if r == 0:
+        # Coincident joints have no direction. Leaving them would collapse
+        # the segment, and straightening would keep the chain on one line, so
+        # step perpendicular to the neighbouring segment (reference->anchor).
+        if reference is not None:
+            dx = reference[1] - anchor[1]
+            dy = anchor[0] - reference[0]
+            r = math.hypot(dx, dy)
+        if r == 0:
+            dx, dy, r = 0.0, 1.0, 1.0
+    lambda_ = length / r
+    free[0] = anchor[0] + lambda_ * dx
+    free[1] = anchor[1] + lambda_ * dy
+
+
+class RoboticArm:
+    """2D arm whose joint positions live in one (num_segments + 1, 2) float64 buffer.
+
+    ``joints`` is a read-only view of that buffer; use ``set_joints``,
+    ``snapshot`` and ``restore`` to change or save the pose.
+    """
+
+    __slots__ = ('num_segments', 'segment_length', 'tolerance', 'max_iterations',
+                 'stall_tolerance', 'elbow', 'cache', 'constraints', 'clamped', '_joints')
+
+    def __init__(self, num_segments=3, segment_length=50, max_iterations=1000, stall_tolerance=None,
+                 elbow=None, buffer=None, cache=None, constraints=None, reset=True):
+        """``buffer`` optionally supplies the (num_segments + 1, 2) float64 array
+        to keep the joints in, e.g. a slice of shared memory; it is reset to
+        the rest pose unless ``reset`` is False, which keeps the pose already
+        stored there. ``cache`` is an optional ik_cache.IKCache consulted for
+        warm starts by the iterative solver. ``constraints`` is an optional
+        constraints.ArmConstraints (joint limits and obstacles) enforced by
+        every solve."""
+        if elbow not in (None, ELBOW_UP, ELBOW_DOWN):
+            raise ValueError(f"elbow must be None, '{ELBOW_UP}' or '{ELBOW_DOWN}', got {elbow!r}")
+        self.num_segments = num_segments
+        self.segment_length = segment_length
+        self.tolerance = 1e-2
+        self.max_iterations = max_iterations
+        self.stall_tolerance = stall_tolerance
+        self.elbow = elbow  # Two-segment branch; None keeps the one nearest the current pose
+        self.cache = cache
+        self.constraints = constraints
+        if buffer is None:
+            self._joints = self._straight_joints()
+        else:
+            if buffer.shape != (num_segments + 1, 2) or buffer.dtype != np.float64:
+                raise ValueError(f"Joint buffer must be float64 of shape {(num_segments + 1, 2)}")
+            self._joints = buffer
+            if reset:
+                self._joints[...] = self._straight_joints()
+        self.clamped = False  # Track claw state: False = open, True = clamped
+        logger.info(f"RoboticArm initialized with {num_segments} segments, segment length {segment_length}")
+
+    def _straight_joints(self):
+        joints = np.zeros((self.num_segments + 1, 2))
+        joints[:, 0] = np.arange(self.num_segments + 1) * self.segment_length
+        return joints
+
+    @property
+    def joints(self):
+        view = self._joints.view()
+        view.flags.writeable = False
+        return view
+
+    @joints.setter
+    def joints(self, values):
+        self.set_joints(values)
+
+    def set_joints(self, values):
+        """Copy ``values`` into the joint buffer in place."""
+        values = np.asarray(values, dtype=float)
+        if values.shape != self._joints.shape:
+            raise ValueError(f"Expected joints of shape {self._joints.shape}, got {values.shape}")
+        self._joints[...] = values
+
+    def snapshot(self):
+        """Return an independent copy of the current pose and claw state."""
+        return self._joints.copy(), self.clamped
+
+    def restore(self, snapshot):
+        joints, clamped = snapshot
+        self.set_joints(joints)
+        self.clamped = clamped
+
+    def workspace(self):
+        """Return (inner, outer) radii of the reachable annulus around the base."""
+        return workspace_annulus(self.num_segments, self.segment_length)
+
+    def solve_ik(self, target, warm_start=True, max_iterations=None, stall_tolerance=None):
+        """Move the end effector toward ``target`` and return an IKResult.
+
+        Targets outside the reachable annulus are answered without iterating,
+        and one- and two-segment arms are solved in closed form. Otherwise the
+        FABRIK loop stops after ``max_iterations`` passes, or early once an
+        iteration improves the error by less than ``stall_tolerance``. Both
+        default to the arm's attributes. With ``warm_start`` the solve starts
+        from the current pose, otherwise from the straight rest pose.
+
+        When the arm has ``constraints`` every solve goes through FABRIK with
+        the joint limits and obstacles applied inside each pass, and the
+        result's ``binding`` / ``collision`` report how the pose is limited.
+        """
+        start = time.perf_counter()
+        target = np.asarray(target, dtype=float)
+        if not np.isfinite(target).all():
+            raise ValueError(f"IK target must be finite, got {target.tolist()}")
+        if max_iterations is None:
+            max_iterations = self.max_iterations
+        if stall_tolerance is None:
+            stall_tolerance = self.stall_tolerance
+
+        # Work on plain floats; the buffer is written back once at the end.
+        joints = (self._joints if warm_start else self._straight_joints()).tolist()
+        tx, ty = target.tolist()
+        base_x, base_y = joints[0]
+        length = self.segment_length
+        dist = math.hypot(base_x - tx, base_y - ty)
+        iterations = 0
+        binding, collision = (), False
+
+        inner, outer = workspace_annulus(self.num_segments, length)
+        reachable = inner - self.tolerance <= dist <= outer
+        if self.constraints is not None:
+            iterations = self._fabrik_constrained(joints, tx, ty, max_iterations, stall_tolerance)
+            binding, collision = self.constraints.binding(joints, length)
+        elif self.num_segments == 1:
+            joints = solve_one_segment(joints[0], (tx, ty), length)
+        elif not reachable:
+            # Outside the annulus the closest pose is the arm stretched
+            # straight at the target, so there is nothing to iterate.
+            for i in range(1, len(joints)):
+                joints[i] = [tx, ty]
+                _place(joints[i - 1], joints[i], length, joints[0] if i > 1 else None)
+        elif self.num_segments == 2:
+            joints = solve_two_segment(joints[0], (tx, ty), length, self.elbow, joints[1])
+        else:
+            if self.cache is not None:
+                seed = self.cache.lookup(self.num_segments, length, joints[0], (tx, ty))
+                if seed is not None:
+                    joints = seed.tolist()
+            diff = math.hypot(joints[-1][0] - tx, joints[-1][1] - ty)
+            while diff > self.tolerance and iterations < max_iterations:
+                joints[-1] = [tx, ty]
+                for i in reversed(range(self.num_segments)):
+                    reference = joints[i + 2] if i + 2 <= self.num_segments else (base_x, base_y)
+                    _place(joints[i + 1], joints[i], length, reference)
+                joints[0] = [base_x, base_y]
+                for i in range(self.num_segments):
+                    _place(joints[i], joints[i + 1], length, joints[i - 1] if i else (tx, ty))
+                iterations += 1
+                prev_diff, diff = diff, math.hypot(joints[-1][0] - tx, joints[-1][1] - ty)
+                if stall_tolerance is not None and prev_diff - diff < stall_tolerance:
+                    break
+            if self.cache is not None and iterations and diff <= self.tolerance:
+                self.cache.store(self.num_segments, length, joints[0], (tx, ty), joints)
+        diff = math.hypot(joints[-1][0] - tx, joints[-1][1] - ty)
+        # A pose with a stretched or collapsed segment is not a solution,
+        # however close its end effector is.
+        intact = all(abs(math.hypot(b[0] - a[0], b[1] - a[1]) - length) <= self.tolerance
+                     for a, b in zip(joints, joints[1:]))
+
+        self._joints[...] = joints
+        result = IKResult(target, bool(reachable), bool(reachable and intact and diff <= self.tolerance and not collision),
+                          iterations, diff, time.perf_counter() - start, binding, collision)
+        if metrics.enabled:
+            metrics.observe_ik(result)
+        if reachable and not result.converged:
+            logger.warning("IK stopped without converging: %s", result)
+        if logger.isEnabledFor(logging.INFO):
+            end_x, end_y = joints[-1]
+            logger.info("IK target (%.2f, %.2f) at distance %.2f: end effector (%.2f, %.2f) "
+                        "after %d iterations, error %.4g, %.1f us",
+                        tx, ty, dist, end_x, end_y, iterations, diff, result.elapsed * 1e6,
+                        extra={'fields': {'event': 'ik', 'target': [tx, ty],
+                                          'segments': self.num_segments, 'reachable': result.reachable,
+                                          'converged': result.converged, 'iterations': iterations,
+                                          'error': diff, 'elapsed': result.elapsed,
+                                          'binding': result.binding}})
+        return result
+
+    def _fabrik_constrained(self, joints, tx, ty, max_iterations, stall_tolerance):
+        # FABRIK with the constraints applied to each joint as it is placed:
+        # the backward pass bends toward the target within the limits of the
+        # joint below, the forward pass re-anchors at the base and enforces
+        # each joint's own limit last, so the angle limits always hold and
+        # obstacle clearance is best effort. Updates ``joints`` in place.
+        c = self.constraints
+        length = self.segment_length
+        n = self.num_segments
+        base = list(joints[0])
+        # Limits and obstacles can pin the end effector short of the target
+        # (or make it oscillate); stop once the best error has not improved
+        # for a few passes.
+        stall = stall_tolerance if stall_tolerance is not None else 1e-6
+        diff = best = math.hypot(joints[-1][0] - tx, joints[-1][1] - ty)
+        iterations = since_best = 0
+        while iterations < max_iterations:
+            joints[-1] = [tx, ty]
+            for i in reversed(range(n)):
+                _place(joints[i + 1], joints[i], length, joints[i + 2] if i + 2 <= n else base)
+                c.limit_backward(joints, i, length)
+                c.avoid(joints, i + 1, i, length)
+            joints[0] = list(base)
+            for i in range(n):
+                _place(joints[i], joints[i + 1], length, joints[i - 1] if i else (tx, ty))
+                c.avoid(joints, i, i + 1, length)
+                c.limit_forward(joints, i, length)
+            iterations += 1
+            diff = math.hypot(joints[-1][0] - tx, joints[-1][1] - ty)
+            if diff <= self.tolerance:
+                break
+            if diff < best - stall:
+                best, since_best = diff, 0
+            else:
+                since_best += 1
+                if since_best >= _CONSTRAINED_PATIENCE:
+                    break
+        return iterations
+
+    def move_along(self, path, dt, speed=100.0, kind=LINEAR, max_iterations=None):
+        """Follow ``path`` at a fixed control rate, yielding a TrajectoryFrame per tick.
+
+        ``path`` is a sequence of (x, y) waypoints joined by straight lines
+        (``kind='linear'``) or a Catmull-Rom spline (``kind='spline'``); it is
+        sampled every ``dt`` seconds at ``speed`` units per second. Each
+        sample is solved warm-started from the previous pose, so consecutive
+        ticks need only a few FABRIK iterations; ``max_iterations`` bounds the
+        work per tick. Frames are produced lazily and carry a copy of the
+        joints.
+        """
+        for i, target in enumerate(sample_path(path, dt, speed, kind)):
+            result = self.solve_ik(target, warm_start=True, max_iterations=max_iterations)
+            yield TrajectoryFrame(i * dt, target, self._joints.copy(), result)
+
+    def solve_ik_batch(self, targets, max_iterations=1000):
+        """Solve many targets from the current pose without moving the arm."""
+        return solve_ik_batch(targets, self.num_segments, self.segment_length,
+                              joints=self._joints, tolerance=self.tolerance,
+                              max_iterations=max_iterations, elbow=self.elbow)
+
+    def toggle_claw(self):
+        self.clamped = not self.clamped
+        logger.info("Claw %s", 'clamped' if self.clamped else 'opened')
+
+    def draw(self, ax):
+        with metrics.timer(metrics.DRAW_SECONDS):
+            ax.clear()
+            ax.set_xlim(-300, 300)
+            ax.set_ylim(-300, 300)
+            ax.set_aspect('equal')
+
+            ax.plot(self._joints[:, 0], self._joints[:, 1], 'o-', linewidth=4, markersize=8, color='blue')
+
+            self.draw_claw(ax)
+
+            ax.set_title("2D Robotic Arm with Claw")
+            # Draw through the axes' own canvas rather than pyplot's current
+            # figure, so offscreen Agg figures work too.
+            ax.figure.canvas.draw_idle()
+
+    def claw_segments(self):
+        """Return the four claw line segments as (start, end) pairs, or [] if undefined."""
+        end = self.joints[-1]
+        prev = self.joints[-2]
+        direction = end - prev
+        length = np.linalg.norm(direction)
+        if length == 0:
+            return []
+        unit_dir = direction / length
+
+        if self.clamped:
+            angle = np.deg2rad(10)
+            claw_len = 30
+            second_segment_len = 15
+        else:
+            angle = np.deg2rad(30)
+            claw_len = 45
+            second_segment_len = 30
+
+        rot_left = np.array([
+            [np.cos(angle), -np.sin(angle)],
+            [np.sin(angle),  np.cos(angle)]
+        ])
+        rot_right = np.array([
+            [np.cos(-angle), -np.sin(-angle)],
+            [np.sin(-angle),  np.cos(-angle)]
+        ])
+
+        claw_left_start = end
+        claw_left_end = end + rot_left @ unit_dir * claw_len
+
+        claw_right_start = end
+        claw_right_end = end + rot_right @ unit_dir * claw_len
+
+        def perp(v):
+            return np.array([-v[1], v[0]])
+
+        left_perp_dir = perp(claw_left_end - claw_left_start)
+        left_perp_dir /= np.linalg.norm(left_perp_dir)
+
+        right_perp_dir = perp(claw_right_end - claw_right_start)
+        right_perp_dir /= np.linalg.norm(right_perp_dir)
+
+        claw_left_second_end = claw_left_end + left_perp_dir * second_segment_len
+        claw_right_second_end = claw_right_end + right_perp_dir * second_segment_len
+
+        return [
+            (claw_left_start, claw_left_end),
+            (claw_right_start, claw_right_end),
+            (claw_left_end, claw_left_second_end),
+            (claw_right_end, claw_right_second_end),
+        ]
+
+    def draw_claw(self, ax):
+        for start, end in self.claw_segments():
+            ax.plot([start[0], end[0]], [start[1], end[1]], color='red', linewidth=3)
+
+
+class Command:
+    def __init__(self, params, key=None, session=None):
+        """Commands built with an explicit ``key`` get their own cipher; all
+        others borrow ``session`` (or the process-wide default session)."""
+        self.params = params
+        if key is not None:
+            self._session = CryptoSession(key)
+        else:
+            self._session = session or default_session()
+
+    def to_bytes(self):
+        """Return the binary wire form of this command (see command_codec)."""
+        return encode_params(self.params)
+
+    def encrypt(self):
+        with metrics.timer(metrics.COMMAND_ENCRYPT_SECONDS):
+            encrypted = self._session.encrypt(self.to_bytes())
+        logger.info("Command encrypted: %s", self.params)
+        return encrypted
+
+    def decrypt(self, token):
+        with metrics.timer(metrics.COMMAND_DECRYPT_SECONDS):
+            params = decode_message(self._session.decrypt(token))
+        logger.info("Command decrypted: %s", params)
+        return params
+
+    @property
+    def key(self):
+        return self._session.key
+
+    @property
+    def session(self):
+        return self._session
+
+class MoveCommand(Command):
+    def __init__(self, x, y, key=None, session=None):
+        params = {'action': 'move', 'x': x, 'y': y}
+        super().__init__(params, key, session)
+
+    def execute(self, robotic_arm):
+        logger.info("Executing MoveCommand to (%s, %s)", self.params['x'], self.params['y'])
+        return robotic_arm.solve_ik(np.array([self.params['x'], self.params['y']]))
+
+class PickUpCommand(Command):
+    def __init__(self, key=None, session=None):
+        params = {'action': 'pickup'}
+        super().__init__(params, key, session)
+
+    def execute(self, robotic_arm):
+        if not robotic_arm.clamped:
+            logger.info("Executing PickUpCommand (clamping claw)")
+            robotic_arm.toggle_claw()
+        else:
+            logger.info("PickUpCommand ignored: claw already clamped")
+
+class PlaceCommand(Command):
+    def __init__(self, key=None, session=None):
+        params = {'action': 'place'}
+        super().__init__(params, key, session)
+
+    def execute(self, robotic_arm):
+        if robotic_arm.clamped:
+            logger.info("Executing PlaceCommand (opening claw)")
+            robotic_arm.toggle_claw()
+        else:
+            logger.info("PlaceCommand ignored: claw already open")
+
+
+
+def parse_command(text, key=None, session=None):
+    """Build a command from its text form (``move X Y``, ``pickup``, ``place``)."""
+    parts = text.strip().split()
+    if not parts:
+        raise ValueError("No command entered.")
+    cmd = parts[0].lower()
+    if cmd == "move" and len(parts) == 3:
+        return MoveCommand(float(parts[1]), float(parts[2]), key, session)
+    if cmd == "pickup" and len(parts) == 1:
+        return PickUpCommand(key, session)
+    if cmd == "place" and len(parts) == 1:
+        return PlaceCommand(key, session)
+    raise ValueError(f"Unknown command or wrong parameters: {text}")
+
+
+def command_from_params(params, key=None, session=None):
+    """Rebuild a command object from a decoded params dict."""
+    action = params.get('action')
+    if action == 'move':
+        return MoveCommand(params['x'], params['y'], key, session)
+    if action == 'pickup':
+        return PickUpCommand(key, session)
+    if action == 'place':
+        return PlaceCommand(key, session)
+    raise ValueError(f"Unknown command action: {action!r}")
+
+
+class CommandExecutor:
+    """Runs queued commands against one arm, one command per step, without rendering."""
+
+    def __init__(self, robotic_arm):
+        self.arm = robotic_arm
+        self._queue = deque()
+        self.steps = 0
+
+    def __len__(self):
+        return len(self._queue)
+
+    def submit(self, command):
+        self._queue.append(command)
+
+    def extend(self, commands):
+        self._queue.extend(commands)
+
+    def load_script(self, lines, key=None, session=None):
+        """Queue commands from text lines; blank lines and ``#`` comments are skipped."""
+        for line in lines:
+            line = line.split('#', 1)[0].strip()
+            if line:
+                self.submit(parse_command(line, key, session))
+
+    def step(self):
+        """Execute the next command and return its result, or None when idle."""
+        if not self._queue:
+            return None
+        command = self._queue.popleft()
+        self.steps += 1
+        return command.execute(self.arm)
+
+    def run(self, max_steps=None):
+        """Drain the queue (or run ``max_steps`` commands) and return how many ran."""
+        ran = 0
+        while self._queue and (max_steps is None or ran < max_steps):
+            self.step()
+            ran += 1
+        return ran
+
+
+if __name__ == "__main__":
+    # Regression checks: targets on a joint must not collapse a segment, and
+    # a non-finite target must be refused without touching the pose.
+    for segments in (3, 4, 5):
+        for target in ((100, 0), (0, 0), (50, 0)):
+            arm = RoboticArm(segments, 50)
+            result = arm.solve_ik(target)
+            lengths = np.hypot(*np.diff(arm.joints, axis=0).T)
+            assert result.converged and np.allclose(lengths, 50, atol=arm.tolerance), (segments, target, lengths)
+    arm = RoboticArm(3, 50)
+    for bad in ((float('nan'), 0), (0, float('inf'))):
+        try:
+            arm.solve_ik(bad)
+            raise AssertionError(f"non-finite target {bad} was accepted")
+        except ValueError as e:
+            print("Rejected:", e)
+    assert np.isfinite(arm.joints).all() and arm.solve_ik((100, 20)).converged
+    print("IK self-checks passed")
@@ -0,0 +1,108 @@
+import logging
+import time
+from collections import deque
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class BlitRenderer:
+    """Incremental matplotlib view of a RoboticArm.
+
+    The arm and claw artists are created once and moved with ``set_data``.
+    Frames are drawn by blitting them over a cached background, and mouse
+    targets are coalesced so at most one solve + redraw happens per frame
+    interval no matter how fast events arrive.
+    """
+
+    def __init__(self, arm, ax, fps=60, limits=300):
+        self.arm = arm
+        self.ax = ax
+        self.canvas = ax.figure.canvas
+        self.frame_interval = 1.0 / fps
+        self._background = None
+        self._pending_target = None
+        self._dirty = True
+        self._frame_times = deque(maxlen=120)
+
+        ax.clear()
+        ax.set_xlim(-limits, limits)
+        ax.set_ylim(-limits, limits)
+        ax.set_aspect('equal')
+        ax.set_title("2D Robotic Arm with Claw")
+        self.arm_line, = ax.plot([], [], 'o-', linewidth=4, markersize=8, color='blue', animated=True)
+        self.claw_lines = [ax.plot([], [], color='red', linewidth=3, animated=True)[0] for _ in range(4)]
+
+        self._cid_draw = self.canvas.mpl_connect('draw_event', self._on_draw)
+        self._timer = self.canvas.new_timer(interval=max(1, int(self.frame_interval * 1000)))
+        self._timer.add_callback(self.flush)
+        self._timer.start()
+
+    @property
+    def artists(self):
+        return [self.arm_line] + self.claw_lines
+
+    def request_target(self, target):
+        """Queue a new IK target; only the latest one per frame is solved."""
+        self._pending_target = target
+
+    def invalidate(self):
+        """Mark the arm as changed so the next frame redraws it."""
+        self._dirty = True
+
+    def flush(self):
+        """Solve the pending target (if any) and blit a frame if anything changed."""
+        target, self._pending_target = self._pending_target, None
+        if target is not None:
+            self.arm.solve_ik(target)
+            self._dirty = True
+        if self._dirty:
+            self.render()
+
+    def update_artists(self):
+        joints = self.arm.joints
+        self.arm_line.set_data(joints[:, 0], joints[:, 1])
+        segments = self.arm.claw_segments()
+        for i, line in enumerate(self.claw_lines):
+            if i < len(segments):
+                start, end = segments[i]
+                line.set_data([start[0], end[0]], [start[1], end[1]])
+            else:
+                line.set_data([], [])
+
+    def render(self):
+        if self._background is None:
+            # No cached background yet; a full draw will recache it and
+            # draw the artists through _on_draw.
+            self.canvas.draw_idle()
+            return
+        with metrics.timer(metrics.DRAW_SECONDS):
+            self.update_artists()
+            self.canvas.restore_region(self._background)
+            for artist in self.artists:
+                self.ax.draw_artist(artist)
+            self.canvas.blit(self.ax.figure.bbox)
+        self._dirty = False
+        self._frame_times.append(time.perf_counter())
+
+    def _on_draw(self, event):
+        # Full redraws (resize, widgets, first show) invalidate the cache.
+        self._background = self.canvas.copy_from_bbox(self.ax.figure.bbox)
+        self.update_artists()
+        for artist in self.artists:
+            self.ax.draw_artist(artist)
+        self._dirty = False
+
+    @property
+    def fps(self):
+        """Frames blitted per second over the recent window."""
+        if len(self._frame_times) < 2:
+            return 0.0
+        span = self._frame_times[-1] - self._frame_times[0]
+        return (len(self._frame_times) - 1) / span if span > 0 else 0.0
+
+    def close(self):
+        self._timer.stop()
+        self.canvas.mpl_disconnect(self._cid_draw)
+        logger.info(f"Renderer closed at {self.fps:.1f} FPS")
@@ -0,0 +1,144 @@
+"""asyncio command pipeline: decrypt/verify -> IK -> render.
+
+Each submitted message starts its crypto work (Fernet decrypt and, when a
+signature is supplied, RSA verification) in a thread pool straight away, so
+many messages are in flight at once. Every arm has its own lane that awaits
+those results in submission order and applies them with ``solve_ik``; lanes
+for different arms run concurrently. Arms that changed are handed to a
+single render stage, which coalesces repeated updates of the same arm into
+one ``render(arm_id, arm)`` call.
+"""
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from arm_core import command_from_params
+from command_codec import decode_message
+from stage_stats import StageStats
+
+logger = logging.getLogger(__name__)
+
+
+class _Lane:
+    def __init__(self, arm, queue_size):
+        self.arm = arm
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.task = None
+
+
+class CommandPipeline:
+    """Pipelined command processing for many arms.
+
+    ``cipher`` is anything with ``decrypt(token) -> bytes`` (a Fernet or a
+    CryptoSession). ``verifier`` is an optional SecurityManager used for
+    messages submitted with an RSA signature over the plaintext.
+    """
+
+    def __init__(self, cipher, verifier=None, render=None, executor=None, queue_size=1024):
+        self.cipher = cipher
+        self.verifier = verifier
+        self.render = render
+        self.queue_size = queue_size
+        self.stats = {name: StageStats() for name in ('crypto', 'ik', 'render', 'total')}
+        self._executor = executor or ThreadPoolExecutor(thread_name_prefix='pipeline-crypto')
+        self._owns_executor = executor is None
+        self._lanes = {}
+        self._render_pending = {}
+        self._render_event = None
+        self._render_task = None
+        self._closing = False
+
+    def add_arm(self, arm_id, arm):
+        lane = _Lane(arm, self.queue_size)
+        lane.task = asyncio.get_running_loop().create_task(self._run_lane(arm_id, lane))
+        self._lanes[arm_id] = lane
+        if self.render is not None and self._render_task is None:
+            self._render_event = asyncio.Event()
+            self._render_task = asyncio.get_running_loop().create_task(self._run_render())
+
+    async def submit(self, arm_id, token, signature=None):
+        """Queue an encrypted command for ``arm_id``.
+
+        Waits while the arm's lane is full. Returns a future that resolves to
+        the command's result (an IKResult for moves) once it has been applied.
+        Rejected commands are logged, so callers that don't need the outcome
+        may drop the future.
+        """
+        loop = asyncio.get_running_loop()
+        submitted = time.perf_counter()
+        crypto = loop.run_in_executor(self._executor, self._open, token, signature)
+        done = loop.create_future()
+        await self._lanes[arm_id].queue.put((crypto, done, submitted))
+        return done
+
+    def _open(self, token, signature):
+        start = time.perf_counter()
+        plaintext = self.cipher.decrypt(token)
+        if signature is not None and not self.verifier.verify_bytes(plaintext, signature):
+            raise ValueError("Command signature is invalid")
+        params = decode_message(plaintext)
+        self.stats['crypto'].add(time.perf_counter() - start)
+        return params
+
+    async def _run_lane(self, arm_id, lane):
+        while True:
+            item = await lane.queue.get()
+            if item is None:
+                lane.queue.task_done()
+                return
+            crypto, done, submitted = item
+            try:
+                params = await crypto
+                start = time.perf_counter()
+                result = command_from_params(params).execute(lane.arm)
+                self.stats['ik'].add(time.perf_counter() - start)
+                if self.render is not None:
+                    self._render_pending[arm_id] = lane.arm
+                    self._render_event.set()
+                self.stats['total'].add(time.perf_counter() - submitted)
+                if not done.cancelled():
+                    done.set_result(result)
+            except Exception as e:
+                logger.warning(f"Command for arm {arm_id!r} rejected: {type(e).__name__}: {e}")
+                if not done.cancelled():
+                    done.set_exception(e)
+                    # Already logged; mark it retrieved so asyncio does not
+                    # warn when the caller dropped the future.
+                    done.exception()
+            finally:
+                lane.queue.task_done()
+
+    async def _run_render(self):
+        while True:
+            await self._render_event.wait()
+            self._render_event.clear()
+            pending, self._render_pending = self._render_pending, {}
+            for arm_id, arm in pending.items():
+                start = time.perf_counter()
+                self.render(arm_id, arm)
+                self.stats['render'].add(time.perf_counter() - start)
+            if self._closing and not self._render_pending:
+                return
+            # Let the lanes run before the next batch of redraws.
+            await asyncio.sleep(0)
+
+    async def join(self):
+        """Wait until every submitted command has been applied."""
+        for lane in self._lanes.values():
+            await lane.queue.join()
+
+    async def close(self):
+        await self.join()
+        self._closing = True
+        for lane in self._lanes.values():
+            await lane.queue.put(None)
+        await asyncio.gather(*(lane.task for lane in self._lanes.values()))
+        if self._render_task is not None:
+            self._render_event.set()
+            await self._render_task
+        if self._owns_executor:
+            self._executor.shutdown(wait=True)
+
+    def metrics(self):
+        return {name: stats.summary() for name, stats in self.stats.items()}
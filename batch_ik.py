@@ -0,0 +1,160 @@
+import numpy as np
+
+from analytic_ik import ELBOW_DOWN, ELBOW_UP, workspace_annulus
+
+
+class BatchIKResult:
+    """Per-target outcome of a batched FABRIK solve."""
+
+    def __init__(self, joints, reachable, converged, iterations, error):
+        self.joints = joints
+        self.reachable = reachable
+        self.converged = converged
+        self.iterations = iterations
+        self.error = error
+
+    def __len__(self):
+        return len(self.joints)
+
+    @property
+    def end_effectors(self):
+        return self.joints[:, -1]
+
+
+def straight_joints(n, num_segments, segment_length):
+    """Return an (n, num_segments + 1, 2) tensor of arms laid out along +x."""
+    line = np.zeros((num_segments + 1, 2))
+    line[:, 0] = np.arange(num_segments + 1) * segment_length
+    return np.broadcast_to(line, (n, num_segments + 1, 2)).copy()
+
+
+def _place(anchor, free, lengths, reference):
+    # Vectorized form of the FABRIK update used by RoboticArm.solve_ik:
+    # move `free` along the anchor->free line so it sits `lengths` away.
+    offset = free - anchor
+    r = np.linalg.norm(offset, axis=1)
+    coincident = r == 0
+    if coincident.any():
+        # No direction: step perpendicular to the neighbouring segment
+        # (reference->anchor), or along +y if that is degenerate too.
+        turn = anchor[coincident] - reference[coincident]
+        turn = np.column_stack([-turn[:, 1], turn[:, 0]])
+        turn[~turn.any(axis=1)] = (0.0, 1.0)
+        offset[coincident] = turn
+        r[coincident] = np.linalg.norm(turn, axis=1)
+    return anchor + (lengths / r)[:, None] * offset
+
+
+def _two_segment_elbows(base, targets, lengths, current, elbow=None):
+    # Vectorized form of analytic_ik.solve_two_segment for reachable rows:
+    # the elbow on the chosen side of the base->target line, or the branch
+    # nearest the current elbow when ``elbow`` is None.
+    offset = targets - base
+    d = np.linalg.norm(offset, axis=1)
+    theta = np.arctan2(offset[:, 1], offset[:, 0])
+    alpha = np.arccos(np.minimum(1.0, d / (2 * lengths)))
+    up = base + lengths[:, None] * np.column_stack([np.cos(theta + alpha), np.sin(theta + alpha)])
+    down = base + lengths[:, None] * np.column_stack([np.cos(theta - alpha), np.sin(theta - alpha)])
+    if elbow == ELBOW_UP:
+        joint = up
+    elif elbow == ELBOW_DOWN:
+        joint = down
+    else:
+        nearer_up = np.linalg.norm(up - current, axis=1) <= np.linalg.norm(down - current, axis=1)
+        joint = np.where(nearer_up[:, None], up, down)
+    # Folded onto the base: keep the current elbow direction (or +x).
+    folded = np.flatnonzero(d == 0)
+    if len(folded):
+        e = current[folded] - base[folded]
+        r = np.linalg.norm(e, axis=1)
+        e[r == 0] = (1.0, 0.0)
+        r[r == 0] = 1.0
+        joint[folded] = base[folded] + lengths[folded][:, None] * e / r[:, None]
+    return joint
+
+
+def solve_ik_batch(targets, num_segments, segment_length, joints=None,
+                   tolerance=1e-2, max_iterations=1000, elbow=None):
+    """Solve FABRIK for N targets at once.
+
+    ``targets`` is an (N, 2) array. ``joints`` optionally gives the starting
+    configuration, either one (num_segments + 1, 2) arm shared by every
+    target or an (N, num_segments + 1, 2) tensor with one arm per target.
+    ``segment_length`` may be a scalar or an (N,) array. The input joints are
+    never modified.
+
+    Reachable targets of two-segment arms are solved in closed form, with
+    ``elbow`` choosing the branch as in ``analytic_ik.solve_two_segment``.
+    """
+    targets = np.asarray(targets, dtype=float).reshape(-1, 2)
+    if not np.isfinite(targets).all():
+        raise ValueError("IK targets must be finite")
+    n = len(targets)
+    if joints is None:
+        out = straight_joints(n, num_segments, 1.0)
+        out *= np.broadcast_to(np.asarray(segment_length, dtype=float), (n,))[:, None, None]
+    else:
+        joints = np.asarray(joints, dtype=float)
+        out = np.broadcast_to(joints, (n, num_segments + 1, 2)).copy()
+    lengths = np.broadcast_to(np.asarray(segment_length, dtype=float), (n,)).copy()
+
+    base = out[:, 0].copy()
+    dist = np.linalg.norm(targets - base, axis=1)
+    inner, outer = workspace_annulus(num_segments, 1.0)
+    reachable = (dist >= inner * lengths - tolerance) & (dist <= outer * lengths)
+    iterations = np.zeros(n, dtype=np.int64)
+
+    # Unreachable targets (and every single-link target): point the arm
+    # straight at the target.
+    far = np.flatnonzero(~reachable | (num_segments == 1))
+    if len(far):
+        offset = targets[far] - base[far]
+        r = dist[far]
+        offset[r == 0] = (1.0, 0.0)
+        r[r == 0] = 1.0
+        direction = offset / r[:, None]
+        steps = np.arange(num_segments + 1)[None, :, None] * lengths[far][:, None, None]
+        out[far] = base[far][:, None, :] + steps * direction[:, None, :]
+
+    # Reachable two-segment targets: closed form, no iterations.
+    if num_segments == 2:
+        rows = np.flatnonzero(reachable)
+        if len(rows):
+            out[rows, 1] = _two_segment_elbows(base[rows], targets[rows], lengths[rows], out[rows, 1], elbow)
+            out[rows, 2] = targets[rows]
+
+    # Other reachable targets: iterate only over the rows that are still
+    # moving, compacting the working set as rows converge.
+    active = np.flatnonzero(reachable & (num_segments > 2))
+    if len(active):
+        err = np.linalg.norm(out[active, -1] - targets[active], axis=1)
+        active = active[err > tolerance]
+    work = out[active]
+    for _ in range(max_iterations):
+        if not len(active):
+            break
+        tgt = targets[active]
+        seg = lengths[active]
+        work[:, -1] = tgt
+        for i in reversed(range(num_segments)):
+            reference = work[:, i + 2] if i + 2 <= num_segments else base[active]
+            work[:, i] = _place(work[:, i + 1], work[:, i], seg, reference)
+        work[:, 0] = base[active]
+        for i in range(num_segments):
+            work[:, i + 1] = _place(work[:, i], work[:, i + 1], seg, work[:, i - 1] if i else tgt)
+        iterations[active] += 1
+
+        done = np.linalg.norm(work[:, -1] - tgt, axis=1) <= tolerance
+        if done.any():
+            out[active[done]] = work[done]
+            active = active[~done]
+            work = work[~done]
+    if len(active):
+        out[active] = work
+
+    error = np.linalg.norm(out[:, -1] - targets, axis=1)
+    # A collapsed or stretched segment is not a solution, however close the
+    # end effector is.
+    stretch = np.abs(np.linalg.norm(np.diff(out, axis=1), axis=2) - lengths[:, None])
+    converged = reachable & (error <= tolerance) & (stretch <= tolerance).all(axis=1)
+    return BatchIKResult(out, reachable, converged, iterations, error)
@@ -0,0 +1,49 @@
+"""Compare the binary command codec with the old str()/eval() round trip.
+
+Run from the repository root:
+
+    python benchmarks/bench_codec.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cryptography.fernet import Fernet  # noqa: E402
+
+from command_codec import encode_params, decode_params  # noqa: E402
+
+PARAMS = {'action': 'move', 'x': 123.456, 'y': -78.9}
+
+
+def legacy_roundtrip(fernet=None):
+    data = str(PARAMS).encode()
+    if fernet is not None:
+        data = fernet.decrypt(fernet.encrypt(data))
+    return eval(data.decode())
+
+
+def binary_roundtrip(fernet=None):
+    data = encode_params(PARAMS)
+    if fernet is not None:
+        data = fernet.decrypt(fernet.encrypt(data))
+    return decode_params(data)
+
+
+def bench(label, func, number):
+    seconds = min(timeit.repeat(func, number=number, repeat=5))
+    print(f"{label:<28} {seconds / number * 1e6:9.2f} us/op  {number / seconds:12,.0f} ops/s")
+
+
+def main():
+    fernet = Fernet(Fernet.generate_key())
+    print(f"legacy payload {len(str(PARAMS).encode())} bytes, binary payload {len(encode_params(PARAMS))} bytes")
+    bench("legacy str/eval", legacy_roundtrip, 20000)
+    bench("binary struct", binary_roundtrip, 200000)
+    bench("legacy str/eval + Fernet", lambda: legacy_roundtrip(fernet), 5000)
+    bench("binary struct + Fernet", lambda: binary_roundtrip(fernet), 5000)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Measure login throughput of the persistent UserStore.
+
+Registers ``--users`` operators in a temporary SQLite file, then replays a
+shift-change burst of ``--logins`` logins (one in ten with a wrong
+password) both inline and through the KDF thread pool. Also times the old
+single-SHA-256 scheme for reference.
+
+Run from the repository root:
+
+    python benchmarks/bench_logins.py
+    python benchmarks/bench_logins.py --users 5000 --logins 500 --n 16384
+"""
+import argparse
+import hashlib
+import hmac
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from user_store import UserStore, SCRYPT_N, SCRYPT_R, SCRYPT_P  # noqa: E402
+
+
+def burst(users, logins, rng):
+    attempts = []
+    for _ in range(logins):
+        name = rng.choice(users)
+        attempts.append((name, 'pw-' + name if rng.random() > 0.1 else 'wrong'))
+    return attempts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--n', type=int, default=SCRYPT_N, help="scrypt N (default %(default)s)")
+    parser.add_argument('--r', type=int, default=SCRYPT_R)
+    parser.add_argument('--p', type=int, default=SCRYPT_P)
+    parser.add_argument('--workers', type=int, default=None, help="KDF threads (default: CPU count)")
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+    rng = random.Random(0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = UserStore(os.path.join(tmp, 'users.db'), args.n, args.r, args.p, args.workers)
+        users = [f'operator{i}' for i in range(args.users)]
+        start = time.perf_counter()
+        for future in [store.register_async(name, 'pw-' + name) for name in users]:
+            future.result()
+        elapsed = time.perf_counter() - start
+        print(f"register x{args.users} (pooled)  {args.users / elapsed:>10,.1f}/s")
+
+        attempts = burst(users, args.logins, rng)
+        start = time.perf_counter()
+        for name, password in attempts:
+            store.verify(name, password)
+        elapsed = time.perf_counter() - start
+        print(f"login x{args.logins} (inline)    {args.logins / elapsed:>10,.1f}/s  "
+              f"{elapsed / args.logins * 1e3:.1f} ms each")
+
+        start = time.perf_counter()
+        futures = [store.verify_async(name, password) for name, password in attempts]
+        ok = sum(future.result() for future in futures)
+        elapsed = time.perf_counter() - start
+        print(f"login x{args.logins} (pooled)    {args.logins / elapsed:>10,.1f}/s  "
+              f"{ok} accepted, {os.cpu_count()} CPUs")
+        store.close()
+
+    # The previous scheme: salted SHA-256 in a dict (fast, and therefore
+    # fast to brute-force too).
+    salt = os.urandom(16).hex()
+    digest = hashlib.sha256((salt + 'pw').encode()).hexdigest()
+    count = 100000
+    start = time.perf_counter()
+    for _ in range(count):
+        hmac.compare_digest(hashlib.sha256((salt + 'pw').encode()).hexdigest(), digest)
+    elapsed = time.perf_counter() - start
+    print(f"old sha256 check                {count / elapsed:>10,.0f}/s")
+
+
+if __name__ == "__main__":
+    main()
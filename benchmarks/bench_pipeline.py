@@ -0,0 +1,130 @@
+"""End-to-end throughput and p99 latency: serial command path vs. CommandPipeline.
+
+Every message is a Fernet-encrypted move with an RSA signature over the
+plaintext, as produced by the sender. The serial path verifies, decrypts,
+solves and "renders" one message at a time; the pipeline overlaps crypto
+across a thread pool and runs one IK lane per arm.
+
+Throughput is measured with every message available up front. Latency is
+measured separately with messages arriving at a fixed ``--rate`` (by
+default 80% of the serial throughput) on both sides, from each message's
+arrival time to the moment it has been applied, so queueing is counted the
+same way for both.
+
+Run from the repository root:
+
+    python benchmarks/bench_pipeline.py --arms 8 --messages 2000
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from arm_core import RoboticArm, MoveCommand, command_from_params  # noqa: E402
+from async_pipeline import CommandPipeline  # noqa: E402
+from command_codec import decode_message  # noqa: E402
+from crypto_session import CryptoSession  # noqa: E402
+from security import SecurityManager  # noqa: E402
+
+
+def make_messages(sm, session, count, arms, seed=0):
+    rng = np.random.default_rng(seed)
+    messages = []
+    for i in range(count):
+        x, y = rng.uniform(-120, 120, 2)
+        data = MoveCommand(float(x), float(y), session=session).to_bytes()
+        messages.append((i % arms, session.encrypt(data), sm.sign_bytes(data)))
+    return messages
+
+
+def render(arm_id, arm):
+    # Stand-in for a frame: touch the joint buffer like a renderer would.
+    return arm.joints[:, 0].sum(), arm.joints[:, 1].sum()
+
+
+def run_serial(sm, session, messages, arms, rate=None):
+    """Process ``messages`` in order; returns (elapsed, latencies).
+
+    With ``rate`` message ``i`` arrives at ``i / rate`` seconds and its
+    latency runs from then until it has been applied.
+    """
+    latencies = []
+    start = time.perf_counter()
+    for i, (arm_id, token, signature) in enumerate(messages):
+        arrival = start + i / rate if rate else time.perf_counter()
+        delay = arrival - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        data = session.decrypt(token)
+        if not sm.verify_bytes(data, signature):
+            raise ValueError("bad signature")
+        command_from_params(decode_message(data), session=session).execute(arms[arm_id])
+        render(arm_id, arms[arm_id])
+        latencies.append(time.perf_counter() - arrival)
+    return time.perf_counter() - start, latencies
+
+
+async def run_pipeline(sm, session, messages, arms, workers, rate=None):
+    """Submit ``messages`` to a CommandPipeline; returns (elapsed, latencies) like run_serial."""
+    executor = ThreadPoolExecutor(max_workers=workers)
+    pipeline = CommandPipeline(session, verifier=sm, render=render, executor=executor)
+    for arm_id, arm in enumerate(arms):
+        pipeline.add_arm(arm_id, arm)
+    latencies = []
+    start = time.perf_counter()
+    for i, (arm_id, token, signature) in enumerate(messages):
+        arrival = start + i / rate if rate else time.perf_counter()
+        delay = arrival - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        done = await pipeline.submit(arm_id, token, signature)
+        done.add_done_callback(lambda _, arrival=arrival: latencies.append(time.perf_counter() - arrival))
+    await pipeline.close()
+    elapsed = time.perf_counter() - start
+    executor.shutdown()
+    return elapsed, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--arms', type=int, default=8)
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--segments', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4)
+    parser.add_argument('--rate', type=float, default=None,
+                        help="Arrival rate for the latency runs, msg/s (default: 80%% of serial throughput)")
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    os.chdir(tempfile.mkdtemp())  # SecurityManager writes its key files to the cwd
+    sm = SecurityManager()
+    session = CryptoSession()
+    messages = make_messages(sm, session, args.messages, args.arms)
+
+    def arms():
+        return [RoboticArm(args.segments, 50) for _ in range(args.arms)]
+
+    serial, _ = run_serial(sm, session, messages, arms())
+    pipelined, _ = asyncio.run(run_pipeline(sm, session, messages, arms(), args.workers))
+    rate = args.rate or 0.8 * len(messages) / serial
+    _, serial_latencies = run_serial(sm, session, messages, arms(), rate)
+    _, pipeline_latencies = asyncio.run(run_pipeline(sm, session, messages, arms(), args.workers, rate))
+
+    print(f"arrivals at {rate:,.0f} msg/s; p99 from arrival to applied")
+    for name, elapsed, latencies in (('serial', serial, serial_latencies),
+                                     ('pipeline', pipelined, pipeline_latencies)):
+        print(f"{name:<9} {len(messages) / elapsed:10,.0f} msg/s  "
+              f"p99 {float(np.percentile(latencies, 99)) * 1e3:8.3f} ms")
+    print(f"({args.arms} arms, {args.workers} pipeline workers)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Measure command throughput with per-command keys vs. a shared CryptoSession.
+
+Run from the repository root:
+
+    python benchmarks/bench_session.py
+"""
+import logging
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cryptography.fernet import Fernet  # noqa: E402
+
+from arm_core import MoveCommand, command_from_params  # noqa: E402
+from command_codec import encode_params, decode_params  # noqa: E402
+from crypto_session import CryptoSession  # noqa: E402
+
+PARAMS = {'action': 'move', 'x': 10.0, 'y': 20.0}
+
+
+def per_command_key():
+    # What handle_command used to do: two commands, each generating a key
+    # and building its own cipher.
+    fernet = Fernet(Fernet.generate_key())
+    params = decode_params(fernet.decrypt(fernet.encrypt(encode_params(PARAMS))))
+    Fernet(Fernet.generate_key())
+    return params
+
+
+def shared_session(session):
+    cmd = MoveCommand(PARAMS['x'], PARAMS['y'], session=session)
+    params = cmd.decrypt(cmd.encrypt())
+    return command_from_params(params, session=session)
+
+
+def setup_only():
+    return Fernet(Fernet.generate_key())
+
+
+def borrow_only(session):
+    return MoveCommand(PARAMS['x'], PARAMS['y'], session=session)
+
+
+def bench(label, func, number):
+    seconds = min(timeit.repeat(func, number=number, repeat=5))
+    print(f"{label:<24} {seconds / number * 1e6:9.2f} us/cmd  {number / seconds:10,.0f} cmds/s")
+
+
+def main():
+    logging.disable(logging.CRITICAL)
+    session = CryptoSession()
+    bench("key + cipher setup", setup_only, 20000)
+    bench("borrow session", lambda: borrow_only(session), 20000)
+    bench("per-command key", per_command_key, 5000)
+    bench("shared session", lambda: shared_session(session), 5000)
+
+
+if __name__ == "__main__":
+    main()
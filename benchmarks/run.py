@@ -0,0 +1,240 @@
+"""Headless benchmark suite for IK, the command codec, crypto and rendering.
+
+Results are written as JSON and can be compared against a stored baseline;
+the exit status is non-zero when any case regresses beyond the threshold,
+so the suite can gate a release. Each case is measured ``--repeat`` times
+and the median is reported, and a baseline is only compared against runs
+with the same ``min_time``, so the gate is not decided by one noisy run.
+
+Run from the repository root:
+
+    python benchmarks/run.py --output results.json
+    python benchmarks/run.py --quick --baseline benchmarks/baseline.json
+    python benchmarks/run.py --quick --save-baseline benchmarks/baseline.json
+    python benchmarks/run.py --only ik --only codec
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import matplotlib  # noqa: E402
+
+matplotlib.use('Agg')
+
+import matplotlib.pyplot as plt  # noqa: E402
+import numpy as np  # noqa: E402
+
+from arm_core import RoboticArm, MoveCommand  # noqa: E402
+from arm_renderer import BlitRenderer  # noqa: E402
+from batch_ik import solve_ik_batch  # noqa: E402
+from command_codec import encode_params, decode_params  # noqa: E402
+from crypto_session import CryptoSession  # noqa: E402
+from security import SecurityManager  # noqa: E402
+
+SEGMENT_COUNTS = (1, 2, 3, 5, 8)
+BATCH_SIZES = (1, 100, 10000)
+PAYLOAD_SIZES = (18, 256, 4096, 65536)
+SEGMENT_LENGTH = 50
+
+
+def measure(func, min_time, ops_per_call=1, warmup=3):
+    """Call ``func`` repeatedly for at least ``min_time`` seconds.
+
+    Returns throughput and per-operation latency statistics; each call is
+    one latency sample divided by ``ops_per_call``.
+    """
+    for _ in range(warmup):
+        func()
+    samples = []
+    start = time.perf_counter()
+    while True:
+        t0 = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - t0) / ops_per_call)
+        if t0 - start >= min_time and len(samples) >= 5:
+            break
+    samples = np.array(samples)
+    return {
+        'ops_per_sec': float(1.0 / samples.mean()),
+        'mean_us': float(samples.mean() * 1e6),
+        'p50_us': float(np.percentile(samples, 50) * 1e6),
+        'p99_us': float(np.percentile(samples, 99) * 1e6),
+        'samples': int(len(samples)),
+    }
+
+
+def ik_cases(min_time):
+    rng = np.random.default_rng(0)
+    for segments in SEGMENT_COUNTS:
+        reach = segments * SEGMENT_LENGTH
+        inner, outer = RoboticArm(segments, SEGMENT_LENGTH).workspace()
+        angles = rng.uniform(0, 2 * np.pi, 256)
+        radii = {'reachable': inner + rng.uniform(0.05, 0.95, 256) * (outer - inner),
+                 'unreachable': rng.uniform(1.2, 2.0, 256) * outer}
+        for kind, r in radii.items():
+            targets = np.column_stack([r * np.cos(angles), r * np.sin(angles)])
+            arm = RoboticArm(segments, SEGMENT_LENGTH)
+            cursor = iter(range(1 << 62))
+
+            def solve():
+                arm.solve_ik(targets[next(cursor) % len(targets)])
+
+            yield f'ik.solve.{kind}.seg{segments}', measure(solve, min_time)
+
+        for batch in BATCH_SIZES:
+            targets = rng.uniform(-0.9, 0.9, (batch, 2)) * reach
+            yield (f'ik.batch.seg{segments}.n{batch}',
+                   measure(lambda: solve_ik_batch(targets, segments, SEGMENT_LENGTH), min_time, batch))
+
+
+def codec_cases(min_time):
+    params = {'action': 'move', 'x': 123.456, 'y': -78.9}
+    data = encode_params(params)
+    yield 'codec.encode', measure(lambda: encode_params(params), min_time)
+    yield 'codec.decode', measure(lambda: decode_params(data), min_time)
+    session = CryptoSession()
+    command = MoveCommand(params['x'], params['y'], session=session)
+    token = command.encrypt()
+    yield 'command.encrypt', measure(command.encrypt, min_time)
+    yield 'command.decrypt', measure(lambda: command.decrypt(token), min_time)
+    for size in PAYLOAD_SIZES:
+        payload = os.urandom(size)
+        token = session.encrypt(payload)
+        yield f'fernet.encrypt.{size}B', measure(lambda: session.encrypt(payload), min_time)
+        yield f'fernet.decrypt.{size}B', measure(lambda: session.decrypt(token), min_time)
+
+
+def crypto_cases(min_time):
+    sm = SecurityManager()
+    for size in PAYLOAD_SIZES:
+        payload = os.urandom(size)
+        signature = sm.sign_bytes(payload)
+        yield f'rsa.sign.{size}B', measure(lambda: sm.sign_bytes(payload), min_time)
+        yield f'rsa.verify.{size}B', measure(lambda: sm.verify_bytes(payload, signature), min_time)
+    sender = sm.open_stream()
+    receiver = sm.accept_stream(sender.handshake, sender.handshake_signature)
+    for size in PAYLOAD_SIZES:
+        payload = os.urandom(size)
+        yield f'stream.seal_open.{size}B', measure(lambda: receiver.open(sender.seal(payload)), min_time)
+
+
+def render_cases(min_time):
+    for segments in SEGMENT_COUNTS:
+        arm = RoboticArm(segments, SEGMENT_LENGTH)
+        arm.solve_ik((SEGMENT_LENGTH * segments * 0.5, SEGMENT_LENGTH))
+        fig, ax = plt.subplots()
+        yield f'render.draw.seg{segments}', measure(lambda: arm.draw(ax), min_time)
+        renderer = BlitRenderer(arm, ax)
+        fig.canvas.draw()
+
+        def blit():
+            renderer.invalidate()
+            renderer.render()
+
+        yield f'render.blit.seg{segments}', measure(blit, min_time)
+        renderer.close()
+        plt.close(fig)
+
+
+GROUPS = {'ik': ik_cases, 'codec': codec_cases, 'crypto': crypto_cases, 'render': render_cases}
+
+
+def median_stats(runs):
+    """Combine repeated measurements of one case by taking the median of each statistic."""
+    combined = {key: float(np.median([run[key] for run in runs])) for key in runs[0] if key != 'samples'}
+    combined['samples'] = int(sum(run['samples'] for run in runs))
+    combined['repeats'] = len(runs)
+    return combined
+
+
+def compare(results, baseline, threshold, p99_threshold=None):
+    """Return a list of regression messages (empty when everything is within threshold).
+
+    Median throughput (from p50 latency, which one slow call cannot move)
+    is always checked; p99 latency only when ``p99_threshold`` is given,
+    since tail latency is much noisier than the median.
+    """
+    regressions = []
+    for name, base in baseline.get('results', {}).items():
+        current = results.get(name)
+        if current is None:
+            continue
+        rate, base_rate = 1e6 / current['p50_us'], 1e6 / base['p50_us']
+        if rate < base_rate * (1 - threshold):
+            regressions.append(f"{name}: median throughput {rate:,.0f}/s vs baseline {base_rate:,.0f}/s")
+        if p99_threshold is not None and current['p99_us'] > base['p99_us'] * (1 + p99_threshold):
+            regressions.append(f"{name}: p99 {current['p99_us']:.1f}us vs baseline {base['p99_us']:.1f}us")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', action='append', choices=sorted(GROUPS), help="Run only these groups")
+    parser.add_argument('--quick', action='store_true', help="Shorter measurements")
+    parser.add_argument('--min-time', type=float, default=None, help="Seconds per case (default 0.5)")
+    parser.add_argument('--output', help="Write results JSON here")
+    parser.add_argument('--baseline', help="Compare against this results JSON")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="Allowed relative drop in median throughput (default 0.2)")
+    parser.add_argument('--p99-threshold', type=float, default=None,
+                        help="Also fail when p99 latency rises by more than this (off by default)")
+    parser.add_argument('--repeat', type=int, default=3, help="Measure each group this many times (default 3)")
+    parser.add_argument('--save-baseline', help="Write results JSON as the new baseline")
+    args = parser.parse_args()
+    min_time = args.min_time if args.min_time is not None else (0.1 if args.quick else 0.5)
+
+    logging.disable(logging.CRITICAL)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        base_min_time = baseline.get('meta', {}).get('min_time')
+        if base_min_time != min_time:
+            print(f"Baseline {args.baseline} was measured with min_time={base_min_time}, this run uses "
+                  f"{min_time}; rerun with matching --min-time/--quick or record a new baseline.",
+                  file=sys.stderr)
+            return 2
+    outputs = [os.path.abspath(path) for path in (args.output, args.save_baseline) if path]
+    os.chdir(tempfile.mkdtemp())  # SecurityManager writes its key files to the cwd
+
+    runs = {}
+    for group in args.only or GROUPS:
+        for _ in range(args.repeat):
+            for name, stats in GROUPS[group](min_time):
+                runs.setdefault(name, []).append(stats)
+    results = {}
+    for name, measured in runs.items():
+        results[name] = stats = median_stats(measured)
+        print(f"{name:<32} {stats['ops_per_sec']:>14,.0f} ops/s  p50 {stats['p50_us']:>10.2f}us  "
+              f"p99 {stats['p99_us']:>10.2f}us", flush=True)
+
+    document = {
+        'meta': {'python': platform.python_version(), 'numpy': np.__version__,
+                 'machine': platform.machine(), 'platform': platform.platform(),
+                 'cpus': os.cpu_count(), 'min_time': min_time, 'repeat': args.repeat,
+                 'time': time.time()},
+        'results': results,
+    }
+    for path in outputs:
+        with open(path, 'w') as f:
+            json.dump(document, f, indent=2, sort_keys=True)
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold, args.p99_threshold)
+        for message in regressions:
+            print(f"REGRESSION {message}")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""Fixed-layout binary encoding for arm commands.
+
+Every message starts with a two-byte header: the format version and an
+opcode. Moves are followed by two little-endian float64 coordinates::
+
+    version:u8 | opcode:u8 [| x:f64 | y:f64]
+
+Messages have a fixed size per opcode, so a buffer of back-to-back messages
+can be split without any extra framing. ``decode_message`` decodes a buffer
+that must hold exactly one message, such as a decrypted command.
+"""
+import math
+import struct
+
+VERSION = 1
+
+OP_MOVE = 1
+OP_PICKUP = 2
+OP_PLACE = 3
+
+HEADER = struct.Struct('<BB')
+MOVE = struct.Struct('<BBdd')
+
+_OPCODES = {'move': OP_MOVE, 'pickup': OP_PICKUP, 'place': OP_PLACE}
+_SIZES = {OP_MOVE: MOVE.size, OP_PICKUP: HEADER.size, OP_PLACE: HEADER.size}
+
+
+class CodecError(ValueError):
+    pass
+
+
+def encode_params(params):
+    """Pack a command ``params`` dict into its wire form."""
+    try:
+        opcode = _OPCODES[params['action']]
+    except KeyError:
+        raise CodecError(f"Cannot encode command params: {params!r}") from None
+    if opcode == OP_MOVE:
+        try:
+            data = MOVE.pack(VERSION, opcode, params['x'], params['y'])
+        except (KeyError, struct.error):
+            raise CodecError(f"Move needs numeric 'x' and 'y': {params!r}") from None
+        if not (math.isfinite(params['x']) and math.isfinite(params['y'])):
+            raise CodecError(f"Move coordinates must be finite: {params!r}")
+        return data
+    return HEADER.pack(VERSION, opcode)
+
+
+def decode_params(data, offset=0):
+    """Unpack one message at ``offset`` of ``data`` back into a params dict."""
+    view = memoryview(data)
+    if len(view) - offset < HEADER.size:
+        raise CodecError("Truncated command header")
+    version, opcode = HEADER.unpack_from(view, offset)
+    if version != VERSION:
+        raise CodecError(f"Unsupported command format version {version}")
+    size = _SIZES.get(opcode)
+    if size is None:
+        raise CodecError(f"Unknown command opcode {opcode}")
+    if len(view) - offset < size:
+        raise CodecError("Truncated command body")
+    if opcode == OP_MOVE:
+        _, _, x, y = MOVE.unpack_from(view, offset)
+        if not (math.isfinite(x) and math.isfinite(y)):
+            raise CodecError(f"Move coordinates must be finite, got ({x}, {y})")
+        return {'action': 'move', 'x': x, 'y': y}
+    if opcode == OP_PICKUP:
+        return {'action': 'pickup'}
+    return {'action': 'place'}
+
+
+def decode_message(data):
+    """Unpack ``data`` holding exactly one message; trailing bytes are an error."""
+    params = decode_params(data)
+    size = message_size(data)
+    if len(data) != size:
+        raise CodecError(f"{len(data) - size} trailing bytes after command message")
+    return params
+
+
+def message_size(data, offset=0):
+    """Return the length of the message starting at ``offset``."""
+    opcode = data[offset + 1]
+    try:
+        return _SIZES[opcode]
+    except KeyError:
+        raise CodecError(f"Unknown command opcode {opcode}") from None
+
+
+def decode_stream(data):
+    """Yield params dicts from a buffer of back-to-back messages."""
+    view = memoryview(data)
+    offset = 0
+    while offset < len(view):
+        params = decode_params(view, offset)
+        offset += message_size(view, offset)
+        yield params
@@ -0,0 +1,372 @@
+"""Append-only container for authenticated command streams.
+
+A command log holds any number of stream sessions (see
+``security.StreamSender``), each with thousands of frames, in one file::
+
+    header   MAGIC 'RACL' | version u8
+    record   length u32 | type u8 | body          (repeated)
+    index    frame offsets u64[n] | session offsets u64[m]
+    trailer  index offset u64 | n u32 | m u32 | INDEX_MAGIC 'RAIX'
+
+Record types are ``HANDSHAKE`` (the session's Fernet-encrypted MAC key and
+its RSA signature), ``META`` (a sealed frame with the session's
+Fernet-encrypted JSON metadata: operator, arm geometry, ...), ``COMMAND``
+(a sealed frame with a Fernet-encrypted ``command_codec`` payload, as sent
+to the receiver daemon) and ``END`` (a fixed-size sealed frame holding the
+session's command count, written on close as the session's last record).
+The index footer is not authenticated; the END record is what lets the
+reader notice commands dropped from the end of a session or from the index.
+
+The writer only ever appends. Reopening a file drops its index and footer,
+starts a new session after the last complete record, and writes a fresh
+index on close. A file without a valid footer (say, the writer crashed)
+is recovered by scanning the length prefixes. The reader memory-maps the
+file, so streaming, seeking to command ``i`` and replaying a range touch
+only the pages they need.
+"""
+import argparse
+import json
+import logging
+import mmap
+import os
+import struct
+from bisect import bisect_left, bisect_right
+
+from arm_core import RoboticArm, command_from_params
+from command_codec import decode_message
+from security import FRAME_HEADER, TAG_SIZE, SecurityManager, StreamError
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'RACL'
+INDEX_MAGIC = b'RAIX'
+VERSION = 1
+HEADER = struct.Struct('<4sB')
+RECORD = struct.Struct('<IB')
+TRAILER = struct.Struct('<QII4s')
+OFFSET = struct.Struct('<Q')
+SIGNED = struct.Struct('<H')
+COUNT = struct.Struct('<Q')
+END_SIZE = RECORD.size + FRAME_HEADER.size + COUNT.size + TAG_SIZE
+
+HANDSHAKE = 1
+META = 2
+COMMAND = 3
+END = 4
+
+
+class CommandLogError(ValueError):
+    pass
+
+
+def _scan(buf, start=HEADER.size):
+    """Return (frame offsets, session offsets, end) of the complete records in ``buf``."""
+    frames, sessions = [], []
+    pos, size = start, len(buf)
+    while pos + RECORD.size <= size:
+        length, kind = RECORD.unpack_from(buf, pos)
+        if pos + RECORD.size + length > size:
+            break  # torn final record
+        if kind == COMMAND:
+            frames.append(pos)
+        elif kind == HANDSHAKE:
+            sessions.append(pos)
+        pos += RECORD.size + length
+    return frames, sessions, pos
+
+
+def _read_index(buf):
+    """Return (frame offsets, session offsets, index offset) from the footer, or None."""
+    if len(buf) < HEADER.size + TRAILER.size:
+        return None
+    index_offset, n, m, magic = TRAILER.unpack_from(buf, len(buf) - TRAILER.size)
+    if magic != INDEX_MAGIC or index_offset + (n + m) * OFFSET.size + TRAILER.size != len(buf):
+        return None
+    offsets = struct.unpack_from(f'<{n + m}Q', buf, index_offset)
+    return list(offsets[:n]), list(offsets[n:]), index_offset
+
+
+def _check_header(buf):
+    if len(buf) < HEADER.size:
+        raise CommandLogError("Not a command log (file too short)")
+    magic, version = HEADER.unpack_from(buf)
+    if magic != MAGIC:
+        raise CommandLogError("Not a command log (bad magic)")
+    if version != VERSION:
+        raise CommandLogError(f"Unsupported command log version {version}")
+
+
+class CommandLogWriter:
+    """Appends one stream session to a command log.
+
+    ``metadata`` is a JSON-serialisable dict stored (encrypted and
+    authenticated) at the start of the session.
+    """
+
+    def __init__(self, path, security_manager=None, metadata=None):
+        self.path = path
+        self.sm = security_manager or SecurityManager()
+        self.stream = self.sm.open_stream()
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        self._file = open(path, 'r+b' if exists else 'w+b')
+        if exists:
+            self._frames, self._sessions, end = self._recover()
+            self._file.seek(end)
+            self._file.truncate()
+        else:
+            self._file.write(HEADER.pack(MAGIC, VERSION))
+            self._frames, self._sessions, end = [], [], HEADER.size
+        self._pos = end
+        self._first = len(self._frames)  # this session's first command
+        self._closed = False
+        self._write_record(HANDSHAKE, SIGNED.pack(len(self.stream.handshake))
+                           + self.stream.handshake + self.stream.handshake_signature)
+        self._write_record(META, self.stream.seal(self.sm.fernet.encrypt(json.dumps(metadata or {}).encode())))
+
+    def _recover(self):
+        with mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            _check_header(buf)
+            index = _read_index(buf)
+            if index is not None:
+                return index
+            frames, sessions, end = _scan(buf)
+            if end != len(buf):
+                logger.warning("Command log %s: no index footer; recovered %d commands by scanning",
+                               self.path, len(frames))
+            return frames, sessions, end
+
+    def _write_record(self, kind, body):
+        offset = self._pos
+        self._file.write(RECORD.pack(len(body), kind))
+        self._file.write(body)
+        self._pos += RECORD.size + len(body)
+        if kind == COMMAND:
+            self._frames.append(offset)
+        elif kind == HANDSHAKE:
+            self._sessions.append(offset)
+        return offset
+
+    def append(self, command):
+        """Append a command object; returns its index in the file."""
+        return self.append_payload(command.to_bytes())
+
+    def append_payload(self, payload):
+        """Append an encoded (``command_codec``) payload; returns its index."""
+        self._write_record(COMMAND, self.stream.seal(self.sm.fernet.encrypt(payload)))
+        return len(self._frames) - 1
+
+    def extend(self, commands):
+        for command in commands:
+            self.append(command)
+        return len(self._frames)
+
+    def __len__(self):
+        return len(self._frames)
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        """Write the session's END record and the index footer, and close the file."""
+        if self._closed:
+            return
+        self._write_record(END, self.stream.seal(COUNT.pack(len(self._frames) - self._first)))
+        offsets = self._frames + self._sessions
+        self._file.write(struct.pack(f'<{len(offsets)}Q', *offsets))
+        self._file.write(TRAILER.pack(self._pos, len(self._frames), len(self._sessions), INDEX_MAGIC))
+        self._file.close()
+        self._closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class LoggedCommand:
+    __slots__ = ('index', 'session', 'seq', 'params')
+
+    def __init__(self, index, session, seq, params):
+        self.index = index
+        self.session = session
+        self.seq = seq
+        self.params = params
+
+    def __repr__(self):
+        return f"LoggedCommand(index={self.index}, session={self.session}, seq={self.seq}, params={self.params})"
+
+
+class CommandLogReader:
+    """Memory-mapped, verifying reader for a command log.
+
+    Only the public key and the Fernet key are needed, so the default
+    SecurityManager is public-key-only. Sessions are verified (one RSA
+    check each, plus their END record's command count) the first time one
+    of their commands is read. A session without an END record (the file
+    was truncated, or its writer crashed) is refused unless
+    ``allow_unterminated`` is set.
+    """
+
+    def __init__(self, path, security_manager=None, allow_unterminated=False):
+        self.path = path
+        self.allow_unterminated = allow_unterminated
+        self.sm = security_manager or SecurityManager(public_only=True)
+        self._file = open(path, 'rb')
+        try:
+            self._buf = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # mmap refuses empty files
+            self._file.close()
+            raise CommandLogError("Not a command log (file is empty)") from None
+        try:
+            _check_header(self._buf)
+        except CommandLogError:
+            self.close()
+            raise
+        index = _read_index(self._buf)
+        if index is None:
+            frames, sessions, end = _scan(self._buf)
+            logger.warning("Command log %s: no index footer; scanned %d commands", path, len(frames))
+        else:
+            frames, sessions, end = index
+        self._frames = frames
+        self._sessions = sessions
+        self._end = end  # where the records stop
+        self._streams = {}
+        self._metadata = {}
+
+    def __len__(self):
+        return len(self._frames)
+
+    @property
+    def session_count(self):
+        return len(self._sessions)
+
+    def _record(self, offset, kind):
+        length, found = RECORD.unpack_from(self._buf, offset)
+        if found != kind:
+            raise CommandLogError(f"Expected record type {kind} at offset {offset}, found {found}")
+        start = offset + RECORD.size
+        return self._buf[start:start + length]
+
+    def _session(self, number):
+        stream = self._streams.get(number)
+        if stream is None:
+            offset = self._sessions[number]
+            body = self._record(offset, HANDSHAKE)
+            size, = SIGNED.unpack_from(body)
+            handshake = body[SIGNED.size:SIGNED.size + size]
+            stream = self.sm.accept_recorded_stream(handshake, body[SIGNED.size + size:])
+            length, _ = RECORD.unpack_from(self._buf, offset)
+            _, meta = stream.authenticate(self._record(offset + RECORD.size + length, META))
+            self._check_end(number, stream)
+            self._metadata[number] = json.loads(self.sm.fernet.decrypt(meta))
+            self._streams[number] = stream
+        return stream
+
+    def _check_end(self, number, stream):
+        # The END record is the last record before the next session (or the
+        # index); its sealed count must match the commands indexed for it.
+        boundary = self._sessions[number + 1] if number + 1 < len(self._sessions) else self._end
+        first = bisect_left(self._frames, self._sessions[number])
+        count = bisect_left(self._frames, boundary) - first
+        offset = boundary - END_SIZE
+        if offset <= self._sessions[number] or RECORD.unpack_from(self._buf, offset) != (END_SIZE - RECORD.size, END):
+            if not self.allow_unterminated:
+                raise CommandLogError(f"Session {number} has no END record (truncated log or crashed writer); "
+                                      f"pass allow_unterminated=True to read it anyway")
+            logger.warning("Command log %s: session %d has no END record; reading %d commands unchecked",
+                           self.path, number, count)
+            return
+        seq, payload = stream.authenticate(self._record(offset, END))
+        recorded, = COUNT.unpack(payload)
+        if recorded != count or seq != count + 2:
+            raise StreamError(f"Session {number} has {count} indexed commands but its END record says {recorded}")
+
+    def session_of(self, index):
+        """Number of the session that command ``index`` belongs to."""
+        return bisect_right(self._sessions, self._frames[index]) - 1
+
+    def metadata(self, session=0):
+        """The metadata dict written with ``session``."""
+        self._session(session)
+        return self._metadata[session]
+
+    def __getitem__(self, index):
+        """Verify and decode command ``index`` (negative indices allowed)."""
+        if index < 0:
+            index += len(self._frames)
+        if not 0 <= index < len(self._frames):
+            raise IndexError(index)
+        session = self.session_of(index)
+        seq, payload = self._session(session).authenticate(self._record(self._frames[index], COMMAND))
+        return LoggedCommand(index, session, seq, decode_message(self.sm.fernet.decrypt(payload)))
+
+    def read(self, start=0, stop=None):
+        """Yield commands ``start`` to ``stop`` in file order.
+
+        Within each session the sequence numbers must run without gaps (the
+        META record is 1, so a session's first command is 2), and the
+        session's END record must account for every command, so frames
+        that were dropped, duplicated or reordered on disk are rejected.
+        """
+        stop = len(self._frames) if stop is None else min(stop, len(self._frames))
+        first = {}
+        for index in range(start, stop):
+            command = self[index]
+            if command.session not in first:
+                first[command.session] = bisect_left(self._frames, self._sessions[command.session])
+            expected = index - first[command.session] + 2
+            if command.seq != expected:
+                raise StreamError(f"Missing, replayed or out-of-order frame {command.seq} in session "
+                                  f"{command.session} (expected {expected})")
+            yield command
+
+    def __iter__(self):
+        return self.read()
+
+    def replay(self, arm, start=0, stop=None):
+        """Execute commands ``start`` to ``stop`` on ``arm``; yields (command, result)."""
+        for command in self.read(start, stop):
+            yield command, command_from_params(command.params).execute(arm)
+
+    def close(self):
+        self._buf.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or replay a command log.")
+    parser.add_argument('action', choices=('info', 'dump', 'replay'))
+    parser.add_argument('path')
+    parser.add_argument('--start', type=int, default=0)
+    parser.add_argument('--stop', type=int, default=None)
+    parser.add_argument('--allow-unterminated', action='store_true',
+                        help="Read sessions that have no END record (crashed writer)")
+    args = parser.parse_args()
+
+    with CommandLogReader(args.path, allow_unterminated=args.allow_unterminated) as log:
+        if args.action == 'info':
+            print(f"{args.path}: {len(log)} commands in {log.session_count} sessions")
+            for session in range(log.session_count):
+                print(f"  session {session}: {log.metadata(session)}")
+        elif args.action == 'dump':
+            for command in log.read(args.start, args.stop):
+                print(command.index, command.session, command.seq, command.params)
+        else:
+            metadata = log.metadata(log.session_of(args.start)) if len(log) else {}
+            arm = RoboticArm(int(metadata.get('segments', 3)), float(metadata.get('segment_length', 50)))
+            replayed = 0
+            for command, result in log.replay(arm, args.start, args.stop):
+                replayed += 1
+            print(f"Replayed {replayed} commands; end effector at {arm.joints[-1].tolist()}")
+
+
+if __name__ == "__main__":
+    main()
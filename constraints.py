@@ -0,0 +1,309 @@
+"""Joint-angle limits and static obstacles for the FABRIK solver.
+
+``ArmConstraints`` bundles per-joint angle limits with a set of ``Circle``
+and ``Box`` obstacles. Obstacles are bucketed into a uniform grid
+(``ObstacleGrid``) so a segment is only tested against the few obstacles
+whose cells it overlaps, which keeps the per-pass cost flat with hundreds
+of obstacles.
+
+Angles are in radians. Joint ``i`` limits the angle of segment ``i``
+relative to segment ``i - 1``; joint 0 limits segment 0 relative to the
++x axis. Relative angles are wrapped to (-pi, pi].
+
+The solver calls ``limit_forward`` / ``limit_backward`` and ``avoid`` on
+every joint it places, and ``binding`` once at the end to report which
+constraints the final pose is resting against.
+"""
+import math
+
+_EPS = 1e-6
+_AVOID_ROUNDS = 4
+
+
+def _wrap(angle):
+    return (angle + math.pi) % (2 * math.pi) - math.pi
+
+
+def _closest_on_segment(px, py, ax, ay, bx, by):
+    """Return (t, qx, qy): the point of segment a-b closest to p."""
+    dx = bx - ax
+    dy = by - ay
+    den = dx * dx + dy * dy
+    t = 0.0 if den == 0 else min(1.0, max(0.0, ((px - ax) * dx + (py - ay) * dy) / den))
+    return t, ax + t * dx, ay + t * dy
+
+
+class Circle:
+    __slots__ = ('x', 'y', 'radius')
+
+    def __init__(self, x, y, radius):
+        if radius <= 0:
+            raise ValueError("radius must be positive")
+        self.x = float(x)
+        self.y = float(y)
+        self.radius = float(radius)
+
+    def bounds(self, margin=0.0):
+        r = self.radius + margin
+        return self.x - r, self.y - r, self.x + r, self.y + r
+
+    def push_out(self, px, py, margin):
+        """Return ``p`` moved to the surface if it lies within ``margin`` of the circle, else None."""
+        dx = px - self.x
+        dy = py - self.y
+        d = math.hypot(dx, dy)
+        r = self.radius + margin
+        if d >= r:
+            return None
+        if d == 0:
+            dx, dy, d = 1.0, 0.0, 1.0
+        return self.x + dx / d * r, self.y + dy / d * r
+
+    def segment_push(self, ax, ay, bx, by, margin):
+        """Return (t, dx, dy): move the point at ``t`` along a-b by (dx, dy) to clear the circle, or None."""
+        t, qx, qy = _closest_on_segment(self.x, self.y, ax, ay, bx, by)
+        moved = self.push_out(qx, qy, margin)
+        if moved is None:
+            return None
+        return t, moved[0] - qx, moved[1] - qy
+
+    def distance(self, ax, ay, bx, by):
+        _, qx, qy = _closest_on_segment(self.x, self.y, ax, ay, bx, by)
+        return math.hypot(qx - self.x, qy - self.y) - self.radius
+
+    def __repr__(self):
+        return f"Circle({self.x:g}, {self.y:g}, {self.radius:g})"
+
+
+class Box:
+    """Axis-aligned box from (xmin, ymin) to (xmax, ymax)."""
+
+    __slots__ = ('xmin', 'ymin', 'xmax', 'ymax')
+
+    def __init__(self, xmin, ymin, xmax, ymax):
+        if xmax <= xmin or ymax <= ymin:
+            raise ValueError("box must have positive width and height")
+        self.xmin = float(xmin)
+        self.ymin = float(ymin)
+        self.xmax = float(xmax)
+        self.ymax = float(ymax)
+
+    def bounds(self, margin=0.0):
+        return self.xmin - margin, self.ymin - margin, self.xmax + margin, self.ymax + margin
+
+    def push_out(self, px, py, margin):
+        """Return ``p`` moved out through the nearest face if it lies within ``margin``, else None."""
+        xmin, ymin, xmax, ymax = self.bounds(margin)
+        if not (xmin < px < xmax and ymin < py < ymax):
+            return None
+        exits = ((px - xmin, xmin, py), (xmax - px, xmax, py), (py - ymin, px, ymin), (ymax - py, px, ymax))
+        _, x, y = min(exits)
+        return x, y
+
+    def _point_distance(self, px, py):
+        dx = max(self.xmin - px, 0.0, px - self.xmax)
+        dy = max(self.ymin - py, 0.0, py - self.ymax)
+        if dx or dy:
+            return math.hypot(dx, dy)
+        return -min(px - self.xmin, self.xmax - px, py - self.ymin, self.ymax - py)
+
+    def _crosses(self, ax, ay, bx, by):
+        # Liang-Barsky clip of segment a-b against the box.
+        t0, t1 = 0.0, 1.0
+        dx = bx - ax
+        dy = by - ay
+        for p, q in ((-dx, ax - self.xmin), (dx, self.xmax - ax), (-dy, ay - self.ymin), (dy, self.ymax - ay)):
+            if p == 0:
+                if q < 0:
+                    return False
+            else:
+                r = q / p
+                if p < 0:
+                    t0 = max(t0, r)
+                else:
+                    t1 = min(t1, r)
+                if t0 > t1:
+                    return False
+        return True
+
+    def distance(self, ax, ay, bx, by):
+        """Signed distance from segment a-b to the box (<= 0 when they overlap)."""
+        if self._crosses(ax, ay, bx, by):
+            return min(0.0, self._point_distance(ax, ay), self._point_distance(bx, by))
+        best = min(self._point_distance(ax, ay), self._point_distance(bx, by))
+        for cx, cy in ((self.xmin, self.ymin), (self.xmin, self.ymax), (self.xmax, self.ymin), (self.xmax, self.ymax)):
+            _, qx, qy = _closest_on_segment(cx, cy, ax, ay, bx, by)
+            best = min(best, math.hypot(qx - cx, qy - cy))
+        return best
+
+    def segment_push(self, ax, ay, bx, by, margin):
+        if self.distance(ax, ay, bx, by) >= margin:
+            return None
+        cx = (self.xmin + self.xmax) / 2
+        cy = (self.ymin + self.ymax) / 2
+        t, qx, qy = _closest_on_segment(cx, cy, ax, ay, bx, by)
+        moved = self.push_out(qx, qy, margin)
+        if moved is None:
+            # The segment clips a corner without its closest point to the
+            # centre being inside; nudge that point straight away from the centre.
+            dx, dy = qx - cx, qy - cy
+            d = math.hypot(dx, dy) or 1.0
+            gap = margin - self.distance(ax, ay, bx, by)
+            return t, dx / d * gap, dy / d * gap
+        return t, moved[0] - qx, moved[1] - qy
+
+    def __repr__(self):
+        return f"Box({self.xmin:g}, {self.ymin:g}, {self.xmax:g}, {self.ymax:g})"
+
+
+class ObstacleGrid:
+    """Uniform grid of obstacle indices keyed by cell."""
+
+    def __init__(self, obstacles, cell_size, margin=0.0):
+        self.cell_size = float(cell_size)
+        self.cells = {}
+        for index, obstacle in enumerate(obstacles):
+            i0, j0, i1, j1 = self._span(*obstacle.bounds(margin))
+            for i in range(i0, i1 + 1):
+                for j in range(j0, j1 + 1):
+                    self.cells.setdefault((i, j), []).append(index)
+
+    def _span(self, xmin, ymin, xmax, ymax):
+        size = self.cell_size
+        return (math.floor(xmin / size), math.floor(ymin / size),
+                math.floor(xmax / size), math.floor(ymax / size))
+
+    def query(self, xmin, ymin, xmax, ymax):
+        """Indices of obstacles whose cells overlap the box, in ascending order."""
+        i0, j0, i1, j1 = self._span(xmin, ymin, xmax, ymax)
+        if i0 == i1 and j0 == j1:
+            return self.cells.get((i0, j0), ())
+        found = set()
+        for i in range(i0, i1 + 1):
+            for j in range(j0, j1 + 1):
+                found.update(self.cells.get((i, j), ()))
+        return sorted(found)
+
+    def near_segment(self, ax, ay, bx, by):
+        return self.query(min(ax, bx), min(ay, by), max(ax, bx), max(ay, by))
+
+
+class ArmConstraints:
+    """Angle limits and obstacles for one arm.
+
+    ``limits`` is a sequence with one ``(min, max)`` pair (or None) per
+    joint, in radians. ``obstacles`` holds Circle and Box instances;
+    segments are kept at least ``clearance`` away from them.
+    ``cell_size`` sets the grid spacing (default: half a segment length,
+    decided on first use).
+    """
+
+    def __init__(self, limits=None, obstacles=(), clearance=0.0, cell_size=None):
+        self.limits = [tuple(limit) if limit is not None else None for limit in (limits or ())]
+        for limit in self.limits:
+            if limit is not None and limit[0] > limit[1]:
+                raise ValueError(f"Joint limit {limit} has min > max")
+        self.obstacles = list(obstacles)
+        self.clearance = float(clearance)
+        self.cell_size = cell_size
+        self._grid = None
+
+    def grid(self, segment_length):
+        if self._grid is None:
+            self._grid = ObstacleGrid(self.obstacles, self.cell_size or segment_length / 2, self.clearance)
+        return self._grid
+
+    def limit(self, joint):
+        return self.limits[joint] if joint < len(self.limits) else None
+
+    def limit_forward(self, joints, i, length):
+        """Rotate joint ``i + 1`` about joint ``i`` into joint ``i``'s angle limit."""
+        limit = self.limit(i)
+        if limit is None:
+            return
+        (ax, ay), (bx, by) = joints[i], joints[i + 1]
+        ref = 0.0 if i == 0 else math.atan2(ay - joints[i - 1][1], ax - joints[i - 1][0])
+        rel = _wrap(math.atan2(by - ay, bx - ax) - ref)
+        clamped = min(max(rel, limit[0]), limit[1])
+        if clamped != rel:
+            joints[i + 1] = [ax + length * math.cos(ref + clamped), ay + length * math.sin(ref + clamped)]
+
+    def limit_backward(self, joints, i, length):
+        """Rotate joint ``i`` about joint ``i + 1`` so the bend at joint ``i + 1`` is within its limit."""
+        limit = self.limit(i + 1)
+        if limit is None or i + 2 >= len(joints):
+            return
+        (ax, ay), (bx, by) = joints[i], joints[i + 1]
+        cx, cy = joints[i + 2]
+        ref = math.atan2(cy - by, cx - bx)
+        # Segment i must point at ref - rel with rel in [min, max].
+        rel = _wrap(ref - math.atan2(by - ay, bx - ax))
+        clamped = min(max(rel, limit[0]), limit[1])
+        if clamped != rel:
+            angle = ref - clamped
+            joints[i] = [bx - length * math.cos(angle), by - length * math.sin(angle)]
+
+    def avoid(self, joints, anchor, free, length):
+        """Push joint ``free`` (and its segment from ``anchor``) out of nearby obstacles, keeping ``length``."""
+        if not self.obstacles:
+            return
+        grid = self.grid(length)
+        margin = self.clearance
+        ax, ay = joints[anchor]
+        fx, fy = joints[free]
+        # A push can rotate the segment into a neighbour, so repeat a few times.
+        for _ in range(_AVOID_ROUNDS):
+            pushed = False
+            for index in grid.near_segment(ax, ay, fx, fy):
+                push = self.obstacles[index].segment_push(ax, ay, fx, fy, margin)
+                if push is None:
+                    continue
+                t, dx, dy = push
+                # Moving the free end by push / t moves the contact point by push.
+                scale = 1.0 / max(t, 0.25)
+                fx += dx * scale
+                fy += dy * scale
+                r = math.hypot(fx - ax, fy - ay)
+                if r > 0:
+                    fx = ax + (fx - ax) * length / r
+                    fy = ay + (fy - ay) * length / r
+                pushed = True
+            if not pushed:
+                break
+        joints[free] = [fx, fy]
+
+    def binding(self, joints, length):
+        """Return (binding, collision) for a finished pose.
+
+        ``binding`` lists ``('joint_limit', i, 'min' | 'max')`` for joints at
+        a limit and ``('obstacle', k)`` for obstacles a segment touches or
+        penetrates; ``collision`` is True if any segment is closer to an
+        obstacle than the clearance allows.
+        """
+        binding = []
+        previous = 0.0
+        for i in range(len(joints) - 1):
+            (ax, ay), (bx, by) = joints[i], joints[i + 1]
+            angle = math.atan2(by - ay, bx - ax)
+            limit = self.limit(i)
+            if limit is not None:
+                rel = _wrap(angle - previous)
+                if rel <= limit[0] + _EPS:
+                    binding.append(('joint_limit', i, 'min'))
+                elif rel >= limit[1] - _EPS:
+                    binding.append(('joint_limit', i, 'max'))
+            previous = angle
+        collision = False
+        if self.obstacles:
+            grid = self.grid(length)
+            touched = set()
+            for i in range(len(joints) - 1):
+                (ax, ay), (bx, by) = joints[i], joints[i + 1]
+                for index in grid.near_segment(ax, ay, bx, by):
+                    gap = self.obstacles[index].distance(ax, ay, bx, by) - self.clearance
+                    if gap <= 1e-3:
+                        touched.add(index)
+                        if gap < -1e-3:
+                            collision = True
+            binding.extend(('obstacle', index) for index in sorted(touched))
+        return binding, collision
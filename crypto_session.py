@@ -0,0 +1,81 @@
+import logging
+import threading
+import time
+
+from cryptography.fernet import Fernet, MultiFernet
+
+logger = logging.getLogger(__name__)
+
+
+class CryptoSession:
+    """One Fernet key and cipher shared by every command in a session.
+
+    Commands borrow the session instead of generating a key and building a
+    cipher each. With ``rotate_every`` (seconds) and/or ``rotate_after``
+    (messages encrypted) the key is replaced on schedule; the previous key is
+    kept for decryption so tokens already in flight still open.
+    """
+
+    def __init__(self, key=None, rotate_every=None, rotate_after=None, clock=time.monotonic):
+        self.rotate_every = rotate_every
+        self.rotate_after = rotate_after
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._previous = None
+        self._install(key or Fernet.generate_key())
+
+    def _install(self, key):
+        if hasattr(self, '_fernet'):
+            self._previous = self._fernet
+        self._key = key
+        self._fernet = Fernet(key)
+        self._decryptor = MultiFernet([self._fernet, self._previous]) if self._previous else self._fernet
+        self._created = self._clock()
+        self._uses = 0
+
+    def _rotation_due(self):
+        if self.rotate_after is not None and self._uses >= self.rotate_after:
+            return True
+        return self.rotate_every is not None and self._clock() - self._created >= self.rotate_every
+
+    def rotate(self, key=None):
+        """Switch to a new key now, keeping the old one for decryption."""
+        with self._lock:
+            self._install(key or Fernet.generate_key())
+        logger.info("Crypto session key rotated")
+
+    @property
+    def key(self):
+        return self._key
+
+    def encrypt(self, data):
+        if self.rotate_every is None and self.rotate_after is None:
+            return self._fernet.encrypt(data)
+        # Check and rotate under one lock, so concurrent callers that all see
+        # the rotation due install one new key between them, not one each.
+        with self._lock:
+            rotated = self._rotation_due()
+            if rotated:
+                self._install(Fernet.generate_key())
+            self._uses += 1
+            fernet = self._fernet
+        if rotated:
+            logger.info("Crypto session key rotated")
+        return fernet.encrypt(data)
+
+    def decrypt(self, token):
+        return self._decryptor.decrypt(token)
+
+
+_default_session = None
+_default_lock = threading.Lock()
+
+
+def default_session():
+    """Return the process-wide session used by commands created without a key."""
+    global _default_session
+    if _default_session is None:
+        with _default_lock:
+            if _default_session is None:
+                _default_session = CryptoSession()
+    return _default_session
@@ -0,0 +1,196 @@
+"""Multi-process fleet simulator.
+
+Arms are sharded across worker processes. Every arm's joint buffer is a
+slice of one ``multiprocessing.shared_memory`` block, so workers solve IK
+straight into shared memory and the parent (or any monitor that attaches
+to the block by name) reads every arm's pose without copying or pickling.
+
+Command streams are shipped to workers as command_codec bytes, which are
+far cheaper to pickle than command objects.
+"""
+import argparse
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from arm_core import RoboticArm, command_from_params
+from command_codec import encode_params, decode_stream
+
+logger = logging.getLogger(__name__)
+
+# Blocks created (and not yet unlinked) by this process.
+_owned = set()
+
+
+def _attach(name, untrack):
+    if not untrack or name in _owned:
+        # Worker processes share their parent's resource tracker, where the
+        # block is already registered; so does the owner itself, whose
+        # registration must survive until it unlinks the block.
+        return shared_memory.SharedMemory(name=name)
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 always registers attachments with the resource
+        # tracker, which would unlink the block when an unrelated monitor
+        # process exits.
+        from multiprocessing import resource_tracker
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+class FleetState:
+    """Joint and claw state for ``num_arms`` arms in one shared memory block.
+
+    ``joints`` is an (num_arms, num_segments + 1, 2) float64 view and
+    ``clamped`` an (num_arms,) uint8 view, both backed by the block.
+    """
+
+    def __init__(self, num_arms, num_segments, name=None, create=True, untrack=True):
+        self.num_arms = num_arms
+        self.num_segments = num_segments
+        joints_size = num_arms * (num_segments + 1) * 2 * 8
+        if create:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=joints_size + num_arms)
+            _owned.add(self.shm.name)
+        else:
+            self.shm = _attach(name, untrack)
+        self._owner = create
+        self.joints = np.ndarray((num_arms, num_segments + 1, 2), dtype=np.float64, buffer=self.shm.buf)
+        self.clamped = np.ndarray((num_arms,), dtype=np.uint8, buffer=self.shm.buf, offset=joints_size)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @classmethod
+    def attach(cls, name, num_arms, num_segments):
+        """Open an existing block read/write from an independent monitor process."""
+        return cls(num_arms, num_segments, name=name, create=False)
+
+    def end_effectors(self):
+        return self.joints[:, -1]
+
+    def close(self):
+        # Views must be dropped before the mapping can be closed.
+        self.joints = self.clamped = None
+        self.shm.close()
+        if self._owner:
+            self.shm.unlink()
+            _owned.discard(self.shm.name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _init_worker():
+    # Workers have no handlers; without this, every non-converged solve in
+    # a shard would reach stderr through logging's last-resort handler.
+    logging.disable(logging.WARNING)
+
+
+def _run_shard(name, num_arms, num_segments, segment_length, streams):
+    """Worker entry point: apply each arm's stream straight into shared memory."""
+    state = FleetState(num_arms, num_segments, name=name, create=False, untrack=False)
+    start = time.perf_counter()
+    applied = 0
+    try:
+        for index, stream in streams:
+            # Pick up where the previous run left this arm.
+            arm = RoboticArm(num_segments, segment_length, buffer=state.joints[index], reset=False)
+            arm.clamped = bool(state.clamped[index])
+            for params in decode_stream(stream):
+                command_from_params(params).execute(arm)
+                state.clamped[index] = arm.clamped
+                applied += 1
+            del arm
+    finally:
+        state.close()
+    return applied, time.perf_counter() - start
+
+
+class FleetSimulator:
+    def __init__(self, num_arms, num_segments=3, segment_length=50, workers=None):
+        self.num_arms = num_arms
+        self.num_segments = num_segments
+        self.segment_length = segment_length
+        self.workers = workers or os.cpu_count() or 1
+        self.state = FleetState(num_arms, num_segments)
+        for i in range(num_arms):
+            # Lay every arm out in its rest pose.
+            RoboticArm(num_segments, segment_length, buffer=self.state.joints[i])
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+
+    @staticmethod
+    def encode_stream(commands):
+        """Pack a sequence of commands (or params dicts) into codec bytes."""
+        return b''.join(encode_params(getattr(command, 'params', command)) for command in commands)
+
+    def run(self, streams):
+        """Apply ``streams`` (arm index -> codec bytes or command list) across the workers.
+
+        Arms are sharded round-robin so each arm's commands stay in order in
+        one process. Returns (commands applied, wall seconds).
+        """
+        shards = [[] for _ in range(self.workers)]
+        for index, stream in streams.items():
+            if not isinstance(stream, (bytes, bytearray, memoryview)):
+                stream = self.encode_stream(stream)
+            shards[index % self.workers].append((index, bytes(stream)))
+        start = time.perf_counter()
+        futures = [self._pool.submit(_run_shard, self.state.name, self.num_arms, self.num_segments,
+                                     self.segment_length, shard)
+                   for shard in shards if shard]
+        applied = sum(future.result()[0] for future in futures)
+        elapsed = time.perf_counter() - start
+        logger.info(f"Fleet applied {applied} commands across {len(futures)} workers in {elapsed:.3f}s")
+        return applied, elapsed
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+        self.state.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def random_streams(num_arms, commands_per_arm, reach, seed=0):
+    rng = np.random.default_rng(seed)
+    streams = {}
+    for index in range(num_arms):
+        points = rng.uniform(-reach, reach, (commands_per_arm, 2))
+        streams[index] = FleetSimulator.encode_stream(
+            {'action': 'move', 'x': float(x), 'y': float(y)} for x, y in points)
+    return streams
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run random move streams on a simulated fleet.")
+    parser.add_argument('--arms', type=int, default=64)
+    parser.add_argument('--commands', type=int, default=2000, help="Moves per arm")
+    parser.add_argument('--segments', type=int, default=3)
+    parser.add_argument('--length', type=float, default=50)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    streams = random_streams(args.arms, args.commands, args.segments * args.length)
+    with FleetSimulator(args.arms, args.segments, args.length, args.workers) as fleet:
+        applied, elapsed = fleet.run(streams)
+        print(f"{applied} commands on {args.arms} arms with {fleet.workers} workers: "
+              f"{applied / elapsed:,.0f} commands/s")
+        print("First end effectors:", fleet.state.end_effectors()[:3].tolist())
+
+
+if __name__ == "__main__":
+    main()
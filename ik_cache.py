@@ -0,0 +1,168 @@
+"""Spatial cache of solved IK poses.
+
+Poses are keyed by arm geometry (``num_segments``, ``segment_length``) and
+by the target snapped to a grid of ``quantum`` units, and stored relative
+to the arm's base. A hit gives FABRIK a starting pose that is already at
+(or within a fraction of ``quantum`` of) the answer, so repeated targets
+converge in zero or one iteration.
+
+Two layers are consulted in order:
+
+* an LRU of poses from real solves, bounded by ``max_entries``;
+* optional precomputed grids over the reachable disk (``precompute_grid``),
+  which give a nearby warm start for any target inside the workspace.
+"""
+from collections import OrderedDict
+
+import numpy as np
+
+from batch_ik import solve_ik_batch
+
+
+class IKCache:
+    def __init__(self, quantum=1.0, max_entries=4096):
+        if quantum <= 0:
+            raise ValueError("quantum must be positive")
+        self.quantum = quantum
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._grids = {}
+        self.hits = 0
+        self.grid_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _key(self, num_segments, segment_length, offset):
+        return (num_segments, float(segment_length),
+                int(round(offset[0] / self.quantum)), int(round(offset[1] / self.quantum)))
+
+    def lookup(self, num_segments, segment_length, base, target):
+        """Return a cached pose (absolute coordinates) for ``target`` or None."""
+        base = np.asarray(base, dtype=float)
+        offset = np.asarray(target, dtype=float) - base
+        key = self._key(num_segments, segment_length, offset)
+        pose = self._entries.get(key)
+        if pose is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return pose + base
+        grid = self._grids.get((num_segments, float(segment_length)))
+        if grid is not None:
+            pose = grid.lookup(offset)
+            if pose is not None:
+                self.grid_hits += 1
+                return pose + base
+        self.misses += 1
+        return None
+
+    def store(self, num_segments, segment_length, base, target, joints):
+        base = np.asarray(base, dtype=float)
+        offset = np.asarray(target, dtype=float) - base
+        key = self._key(num_segments, segment_length, offset)
+        self._entries[key] = np.array(joints, dtype=float) - base
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def precompute_grid(self, num_segments, segment_length, step=None, tolerance=1e-2):
+        """Solve a square grid covering the reachable disk and keep it for warm starts.
+
+        ``step`` defaults to the cache quantum. Returns the number of grid
+        points that converged.
+        """
+        grid = _WarmStartGrid.build(num_segments, segment_length, step or self.quantum, tolerance)
+        self._grids[(num_segments, float(segment_length))] = grid
+        return int(grid.valid.sum())
+
+    def clear(self):
+        self._entries.clear()
+        self._grids.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        lookups = self.hits + self.grid_hits + self.misses
+        entry_bytes = sum(pose.nbytes for pose in self._entries.values())
+        grid_bytes = sum(grid.nbytes for grid in self._grids.values())
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'grids': len(self._grids),
+            'hits': self.hits,
+            'grid_hits': self.grid_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': (self.hits + self.grid_hits) / lookups if lookups else 0.0,
+            'entry_bytes': entry_bytes,
+            'grid_bytes': grid_bytes,
+        }
+
+    # --- persistence ---
+    def save(self, path):
+        """Write the LRU entries and grids to an ``.npz`` file (no pickling)."""
+        arrays = {'meta': np.array([self.quantum, self.max_entries], dtype=float)}
+        by_shape = {}
+        for key, pose in self._entries.items():
+            by_shape.setdefault(key[0], []).append((key, pose))
+        for num_segments, items in by_shape.items():
+            arrays[f'keys_{num_segments}'] = np.array([key[1:] for key, _ in items], dtype=float)
+            arrays[f'poses_{num_segments}'] = np.stack([pose for _, pose in items])
+        for i, ((num_segments, segment_length), grid) in enumerate(self._grids.items()):
+            arrays[f'grid_{i}_geometry'] = np.array([num_segments, segment_length, grid.step, grid.half])
+            arrays[f'grid_{i}_poses'] = grid.poses
+            arrays[f'grid_{i}_valid'] = grid.valid
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            quantum, max_entries = data['meta']
+            cache = cls(quantum=float(quantum), max_entries=int(max_entries))
+            for name in data.files:
+                if name.startswith('keys_'):
+                    num_segments = int(name[len('keys_'):])
+                    for key, pose in zip(data[name], data[f'poses_{num_segments}']):
+                        cache._entries[(num_segments, float(key[0]), int(key[1]), int(key[2]))] = pose
+                elif name.endswith('_geometry'):
+                    prefix = name[:-len('_geometry')]
+                    num_segments, segment_length, step, half = data[name]
+                    grid = _WarmStartGrid(float(step), int(half), data[f'{prefix}_poses'],
+                                          data[f'{prefix}_valid'])
+                    cache._grids[(int(num_segments), float(segment_length))] = grid
+        return cache
+
+
+class _WarmStartGrid:
+    """Dense (2 * half + 1)^2 grid of base-relative poses with a validity mask."""
+
+    def __init__(self, step, half, poses, valid):
+        self.step = step
+        self.half = half
+        self.poses = poses
+        self.valid = valid
+
+    @property
+    def nbytes(self):
+        return self.poses.nbytes + self.valid.nbytes
+
+    @classmethod
+    def build(cls, num_segments, segment_length, step, tolerance):
+        reach = num_segments * segment_length
+        half = int(np.ceil(reach / step))
+        axis = np.arange(-half, half + 1) * step
+        xs, ys = np.meshgrid(axis, axis, indexing='ij')
+        targets = np.column_stack([xs.ravel(), ys.ravel()])
+        result = solve_ik_batch(targets, num_segments, segment_length, tolerance=tolerance)
+        size = 2 * half + 1
+        poses = result.joints.reshape(size, size, num_segments + 1, 2)
+        return cls(step, half, poses, result.converged.reshape(size, size))
+
+    def lookup(self, offset):
+        i = int(round(offset[0] / self.step)) + self.half
+        j = int(round(offset[1] / self.step)) + self.half
+        size = 2 * self.half + 1
+        if 0 <= i < size and 0 <= j < size and self.valid[i, j]:
+            return self.poses[i, j]
+        return None
@@ -0,0 +1,115 @@
+"""Logging setup for the GUI, daemons and workers.
+
+``configure_logging`` replaces the old import-time ``basicConfig``. Records
+are handed to a queue and written by a background listener thread, so the
+calling thread never formats messages or touches the file. The file is
+rotated by size, an optional per-call-site rate limit drops floods from hot
+paths (mouse moves, IK) before they are queued, and ``json_lines=True``
+writes one JSON object per record, including any ``extra={'fields': {...}}``
+data, for offline analysis.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+
+DEFAULT_FORMAT = '%(asctime)s [%(levelname)s] %(message)s'
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'time': record.created,
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        fields = getattr(record, 'fields', None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """Token bucket per call site (file and line).
+
+    Each site may log ``burst`` records at once and ``rate`` records per
+    second on average; the rest are dropped and counted in ``dropped``.
+    Records at ``exempt_level`` or above always pass.
+    """
+
+    def __init__(self, rate=10.0, burst=20, exempt_level=logging.WARNING):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.exempt_level = exempt_level
+        self.dropped = 0
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= self.exempt_level:
+            return True
+        site = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(site, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            if tokens < 1:
+                self._buckets[site] = (tokens, now)
+                self.dropped += 1
+                return False
+            self._buckets[site] = (tokens - 1, now)
+        return True
+
+
+class _LazyQueueHandler(logging.handlers.QueueHandler):
+    # The stock QueueHandler formats the message in the calling thread so
+    # records can be pickled. Our queue never leaves the process, so leave
+    # formatting to the listener thread.
+    def prepare(self, record):
+        return record
+
+
+class _Listener(logging.handlers.QueueListener):
+    def stop(self):
+        # Safe to call twice (explicitly and again from atexit).
+        if self._thread is not None:
+            super().stop()
+
+
+def configure_logging(filename='robotic_arm.log', level=logging.INFO, async_=True, json_lines=False,
+                      max_bytes=10 * 1024 * 1024, backup_count=5, rate_limit=None, burst=20):
+    """Configure the root logger and return the QueueListener (or None when synchronous).
+
+    ``rate_limit`` is the per-call-site records-per-second budget for
+    records below WARNING; None disables rate limiting.
+    """
+    if filename is None:
+        handler = logging.StreamHandler()
+    else:
+        handler = logging.handlers.RotatingFileHandler(filename, maxBytes=max_bytes, backupCount=backup_count)
+    handler.setFormatter(JsonFormatter() if json_lines else logging.Formatter(DEFAULT_FORMAT))
+
+    root = logging.getLogger()
+    for old in root.handlers[:]:
+        root.removeHandler(old)
+    root.setLevel(level)
+
+    listener = None
+    if async_:
+        front = _LazyQueueHandler(queue.SimpleQueue())
+        listener = _Listener(front.queue, handler, respect_handler_level=True)
+        listener.start()
+        atexit.register(listener.stop)
+    else:
+        front = handler
+    if rate_limit is not None:
+        front.addFilter(RateLimitFilter(rate_limit, burst))
+    root.addHandler(front)
+    return listener
@@ -0,0 +1,199 @@
+"""Opt-in histograms for IK, crypto and rendering.
+
+Instrumentation is off by default. Hot paths check the module-level
+``enabled`` flag (or use ``timer``, which hands back a shared no-op context
+when disabled), so the cost when off is one attribute lookup per call.
+
+    import metrics
+    metrics.enable(prometheus_path='metrics.prom', port=9100)
+
+``enable`` can dump a text report at exit, rewrite a Prometheus text file
+on exit, and/or serve the same text at ``http://host:port/metrics``.
+``enable_from_env`` does the same from ``ROBOTIC_ARM_METRICS*`` variables.
+"""
+import atexit
+import bisect
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+enabled = False
+
+SECONDS_BUCKETS = (1e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3,
+                   1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0)
+ITERATION_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=SECONDS_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+            if value > self.max:
+                self.max = value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the ``q`` quantile (0-1)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.max
+
+    def prometheus(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{{le="{bound:g}"}} {cumulative}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {self.count}')
+        lines.append(f"{self.name}_sum {self.sum:.9g}")
+        lines.append(f"{self.name}_count {self.count}")
+        return "\n".join(lines)
+
+
+class _Timer:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return None
+
+
+_NULL_TIMER = _NullTimer()
+
+IK_SECONDS = Histogram('robotic_arm_solve_ik_seconds', "RoboticArm.solve_ik wall time")
+IK_ITERATIONS = Histogram('robotic_arm_solve_ik_iterations', "FABRIK iterations per solve_ik call",
+                          ITERATION_BUCKETS)
+COMMAND_ENCRYPT_SECONDS = Histogram('robotic_arm_command_encrypt_seconds', "Command.encrypt wall time")
+COMMAND_DECRYPT_SECONDS = Histogram('robotic_arm_command_decrypt_seconds', "Command.decrypt wall time")
+SIGN_SECONDS = Histogram('robotic_arm_security_sign_seconds', "SecurityManager RSA sign wall time")
+VERIFY_SECONDS = Histogram('robotic_arm_security_verify_seconds', "SecurityManager RSA verify wall time")
+DRAW_SECONDS = Histogram('robotic_arm_draw_seconds', "Frame time of RoboticArm.draw / BlitRenderer.render")
+
+HISTOGRAMS = [IK_SECONDS, IK_ITERATIONS, COMMAND_ENCRYPT_SECONDS, COMMAND_DECRYPT_SECONDS,
+              SIGN_SECONDS, VERIFY_SECONDS, DRAW_SECONDS]
+
+
+def timer(histogram):
+    """Context manager that records its duration in ``histogram`` when enabled."""
+    return _Timer(histogram) if enabled else _NULL_TIMER
+
+
+def observe_ik(result):
+    IK_SECONDS.observe(result.elapsed)
+    IK_ITERATIONS.observe(result.iterations)
+
+
+def prometheus_text():
+    return "\n".join(histogram.prometheus() for histogram in HISTOGRAMS) + "\n"
+
+
+def report():
+    lines = [f"{'metric':<40} {'count':>9} {'mean':>10} {'p50':>10} {'p99':>10} {'max':>10}"]
+    for histogram in HISTOGRAMS:
+        if not histogram.count:
+            continue
+        mean = histogram.sum / histogram.count
+        lines.append(f"{histogram.name:<40} {histogram.count:>9} {mean:>10.4g} "
+                     f"{histogram.quantile(0.5):>10.4g} {histogram.quantile(0.99):>10.4g} "
+                     f"{histogram.max:>10.4g}")
+    return "\n".join(lines)
+
+
+def write_prometheus(path):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(prometheus_text())
+    os.replace(tmp, path)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip('/') != '/metrics':
+            self.send_error(404)
+            return
+        body = prometheus_text().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port, host='127.0.0.1'):
+    """Serve ``/metrics`` from a daemon thread; returns the server."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def enable(dump_on_exit=True, prometheus_path=None, port=None):
+    global enabled
+    enabled = True
+    if dump_on_exit:
+        atexit.register(lambda: print(report(), file=sys.stderr))
+    if prometheus_path:
+        atexit.register(write_prometheus, prometheus_path)
+    if port:
+        return serve(port)
+    return None
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def reset():
+    for histogram in HISTOGRAMS:
+        histogram.__init__(histogram.name, histogram.help, histogram.buckets)
+
+
+def enable_from_env(environ=os.environ):
+    """Enable metrics when ``ROBOTIC_ARM_METRICS`` is set.
+
+    ``ROBOTIC_ARM_METRICS_FILE`` and ``ROBOTIC_ARM_METRICS_PORT`` select the
+    Prometheus file and HTTP port.
+    """
+    if not environ.get('ROBOTIC_ARM_METRICS'):
+        return None
+    port = environ.get('ROBOTIC_ARM_METRICS_PORT')
+    return enable(prometheus_path=environ.get('ROBOTIC_ARM_METRICS_FILE'), port=int(port) if port else None)
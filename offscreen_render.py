@@ -0,0 +1,237 @@
+"""Offscreen rendering of arm state streams to PNG sequences or video.
+
+A state stream is a pair of arrays: ``joints`` (frames, num_segments + 1, 2)
+and ``clamped`` (frames,). ``replay_states`` builds one from a command
+sequence and ``states_from_log`` from a command log. ``OffscreenRenderer``
+splits the stream into chunks and renders them on a process pool. Each
+worker keeps one Agg figure whose artists are moved with ``set_data``, so a
+frame costs one Agg draw and no pyplot or GUI is involved.
+
+Frames can be written as a numbered PNG sequence (by the workers), as raw
+RGB24 bytes to any binary file (in frame order), or straight into a video
+encoder such as ffmpeg through its stdin. At most ``2 * workers`` chunks
+are in flight, so memory use stays bounded for long shifts.
+
+    python offscreen_render.py shift.racl --video shift.mp4 --fps 30
+    python offscreen_render.py shift.racl --png frames/
+"""
+import argparse
+import logging
+import os
+import subprocess
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from arm_core import RoboticArm, command_from_params
+
+logger = logging.getLogger(__name__)
+
+PNG = 'png'
+RAW = 'raw'
+
+# One figure per worker process, reused for every chunk with the same layout.
+_frame = None
+
+
+class _Frame:
+    def __init__(self, num_segments, segment_length, size, dpi, limits, title):
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        self.key = (num_segments, segment_length, size, dpi, limits, title)
+        self.figure = Figure(figsize=(size[0] / dpi, size[1] / dpi), dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.figure)
+        ax = self.figure.add_subplot()
+        ax.set_xlim(-limits, limits)
+        ax.set_ylim(-limits, limits)
+        ax.set_aspect('equal')
+        ax.set_title(title)
+        self.arm_line, = ax.plot([], [], 'o-', linewidth=4, markersize=8, color='blue')
+        self.claw_lines = [ax.plot([], [], color='red', linewidth=3)[0] for _ in range(4)]
+        self.arm = RoboticArm(num_segments, segment_length)
+
+    def render(self, joints, clamped):
+        """Draw one state and return its (height, width, 4) RGBA buffer."""
+        self.arm.set_joints(joints)
+        self.arm.clamped = bool(clamped)
+        self.arm_line.set_data(joints[:, 0], joints[:, 1])
+        segments = self.arm.claw_segments()
+        for i, line in enumerate(self.claw_lines):
+            if i < len(segments):
+                start, end = segments[i]
+                line.set_data([start[0], end[0]], [start[1], end[1]])
+            else:
+                line.set_data([], [])
+        self.canvas.draw()
+        return np.asarray(self.canvas.buffer_rgba())
+
+
+def _render_chunk(layout, start, joints, clamped, mode, pattern):
+    """Worker entry point: render frames ``start``.. and write PNGs or return RGB bytes."""
+    global _frame
+    logging.disable(logging.INFO)
+    if _frame is None or _frame.key != layout:
+        _frame = _Frame(*layout)
+    if mode == PNG:
+        from matplotlib.image import imsave
+        for offset, (pose, claw) in enumerate(zip(joints, clamped)):
+            imsave(pattern.format(start + offset), _frame.render(pose, claw), format='png')
+        return len(joints)
+    out = bytearray()
+    for pose, claw in zip(joints, clamped):
+        out += _frame.render(pose, claw)[:, :, :3].tobytes()
+    return len(joints), bytes(out)
+
+
+def replay_states(commands, num_segments=3, segment_length=50, arm=None):
+    """Execute ``commands`` (objects or params dicts) and return (joints, clamped) after each."""
+    arm = arm or RoboticArm(num_segments, segment_length)
+    joints, clamped = [], []
+    for command in commands:
+        if isinstance(command, dict):
+            command = command_from_params(command)
+        command.execute(arm)
+        joints.append(arm.joints.copy())
+        clamped.append(arm.clamped)
+    return np.array(joints).reshape(-1, arm.num_segments + 1, 2), np.array(clamped, dtype=bool)
+
+
+def states_from_log(path, start=0, stop=None, security_manager=None):
+    """Replay a command log (see command_log) and return (joints, clamped, metadata)."""
+    from command_log import CommandLogReader
+
+    with CommandLogReader(path, security_manager) as log:
+        metadata = log.metadata(log.session_of(start)) if len(log) else {}
+        arm = RoboticArm(int(metadata.get('segments', 3)), float(metadata.get('segment_length', 50)))
+        joints, clamped = replay_states((command.params for command in log.read(start, stop)), arm=arm)
+    return joints, clamped, metadata
+
+
+class OffscreenRenderer:
+    """Renders state streams on a pool of Agg workers.
+
+    ``size`` is the frame size in pixels (width, height); even sizes keep
+    video encoders happy. ``chunk_size`` frames are rendered per task.
+    """
+
+    def __init__(self, num_segments, segment_length=50, size=(640, 640), dpi=100, limits=300,
+                 workers=None, chunk_size=32, title="2D Robotic Arm with Claw"):
+        self.num_segments = num_segments
+        self.size = tuple(size)
+        self.layout = (num_segments, float(segment_length), self.size, dpi, limits, title)
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self._pool = ProcessPoolExecutor(max_workers=self.workers)
+
+    def _chunks(self, joints, clamped, mode, pattern=None):
+        # Yield chunk results in order with a bounded number of tasks in flight.
+        joints = np.asarray(joints, dtype=float)
+        clamped = np.asarray(clamped, dtype=bool)
+        if joints.shape[1:] != (self.num_segments + 1, 2) or len(clamped) != len(joints):
+            raise ValueError(f"Expected joints of shape (frames, {self.num_segments + 1}, 2) "
+                             f"and one clamped flag per frame")
+        pending = deque()
+        for start in range(0, len(joints), self.chunk_size):
+            stop = start + self.chunk_size
+            pending.append(self._pool.submit(_render_chunk, self.layout, start, joints[start:stop],
+                                             clamped[start:stop], mode, pattern))
+            if len(pending) >= 2 * self.workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    def render_png(self, joints, clamped, directory, pattern='frame_{:06d}.png'):
+        """Write one PNG per frame into ``directory``; returns the frame count."""
+        os.makedirs(directory, exist_ok=True)
+        start = time.perf_counter()
+        count = sum(self._chunks(joints, clamped, PNG, os.path.join(directory, pattern)))
+        self._log(count, start, directory)
+        return count
+
+    def render_raw(self, joints, clamped, out):
+        """Write frames as packed RGB24 (height x width x 3 bytes each) to ``out``; returns the frame count."""
+        start = time.perf_counter()
+        count = 0
+        for frames, data in self._chunks(joints, clamped, RAW):
+            out.write(data)
+            count += frames
+        self._log(count, start, getattr(out, 'name', 'stream'))
+        return count
+
+    def encoder_command(self, path, fps=30, encoder='ffmpeg', codec='libx264'):
+        """Command line for an encoder reading raw RGB24 frames on stdin."""
+        width, height = self.size
+        return [encoder, '-y', '-loglevel', 'error', '-f', 'rawvideo', '-pix_fmt', 'rgb24',
+                '-s', f'{width}x{height}', '-r', str(fps), '-i', '-',
+                '-c:v', codec, '-pix_fmt', 'yuv420p', path]
+
+    def render_video(self, joints, clamped, path, fps=30, command=None):
+        """Pipe raw frames into a video encoder (ffmpeg by default); returns the frame count."""
+        command = command or self.encoder_command(path, fps)
+        try:
+            process = subprocess.Popen(command, stdin=subprocess.PIPE)
+        except FileNotFoundError:
+            raise RuntimeError(f"Video encoder {command[0]!r} not found; install it or use render_png/render_raw")
+        try:
+            count = self.render_raw(joints, clamped, process.stdin)
+        finally:
+            process.stdin.close()
+            returncode = process.wait()
+        if returncode:
+            raise RuntimeError(f"Encoder {command[0]} exited with status {returncode}")
+        return count
+
+    def _log(self, count, start, target):
+        elapsed = time.perf_counter() - start
+        logger.info("Rendered %d frames to %s in %.2fs (%.1f frames/s, %d workers)",
+                    count, target, elapsed, count / elapsed if elapsed else 0.0, self.workers)
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render a command log offscreen.")
+    parser.add_argument('log', help="Command log to replay (see command_log.py)")
+    output = parser.add_mutually_exclusive_group(required=True)
+    output.add_argument('--png', metavar='DIR', help="Write a PNG sequence into DIR")
+    output.add_argument('--raw', metavar='FILE', help="Write raw RGB24 frames to FILE ('-' for stdout)")
+    output.add_argument('--video', metavar='FILE', help="Encode with ffmpeg into FILE")
+    parser.add_argument('--fps', type=int, default=30)
+    parser.add_argument('--size', type=int, nargs=2, default=(640, 640), metavar=('WIDTH', 'HEIGHT'))
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--start', type=int, default=0)
+    parser.add_argument('--stop', type=int, default=None)
+    args = parser.parse_args()
+
+    joints, clamped, metadata = states_from_log(args.log, args.start, args.stop)
+    num_segments = joints.shape[1] - 1 if len(joints) else int(metadata.get('segments', 3))
+    started = time.perf_counter()
+    with OffscreenRenderer(num_segments, float(metadata.get('segment_length', 50)), args.size,
+                           workers=args.workers) as renderer:
+        if args.png:
+            count = renderer.render_png(joints, clamped, args.png)
+        elif args.video:
+            count = renderer.render_video(joints, clamped, args.video, args.fps)
+        elif args.raw == '-':
+            count = renderer.render_raw(joints, clamped, sys.stdout.buffer)
+        else:
+            with open(args.raw, 'wb') as f:
+                count = renderer.render_raw(joints, clamped, f)
+    elapsed = time.perf_counter() - started
+    print(f"{count} frames in {elapsed:.2f}s ({count / elapsed:.1f} frames/s, "
+          f"{count / args.fps / elapsed:.1f}x real time at {args.fps} fps)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""Long-running command receiver.
+
+Instead of reading one ``encrypted_command.bin`` per process, the daemon
+keeps a SecurityManager and a RoboticArm loaded and accepts command streams
+over TCP or a Unix domain socket. Every message on the wire is a 4-byte
+big-endian length followed by the bytes. A connection opens with the
+stream handshake and its RSA signature (see ``SecurityManager.open_stream``)
+and then carries frames whose payloads are Fernet-encrypted command_codec
+messages.
+
+Frames are authenticated and decrypted in a thread pool, queued in arrival
+order on a bounded queue and applied to the arm by a single thread. When
+the queue is full the connection thread stops reading, so a fast sender is
+slowed down by TCP flow control instead of growing memory.
+"""
+import argparse
+import logging
+import os
+import queue
+import socket
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from arm_core import RoboticArm, command_from_params
+from command_codec import decode_message
+from log_config import configure_logging
+import metrics
+from security import SecurityManager, SessionCache, StreamError
+from stage_stats import StageStats
+
+logger = logging.getLogger(__name__)
+
+LENGTH = struct.Struct('>I')
+MAX_MESSAGE_SIZE = 1 << 20
+
+
+def send_message(sock, data):
+    sock.sendall(LENGTH.pack(len(data)) + data)
+
+
+def recv_exact(sock, size):
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            return None
+        buf += chunk
+    return bytes(buf)
+
+
+def recv_message(sock):
+    """Return the next message, or None when the peer closed the connection."""
+    header = recv_exact(sock, LENGTH.size)
+    if header is None:
+        return None
+    (size,) = LENGTH.unpack(header)
+    if size > MAX_MESSAGE_SIZE:
+        raise StreamError(f"Message of {size} bytes exceeds limit")
+    return recv_exact(sock, size)
+
+
+def _make_socket(address):
+    if isinstance(address, str):
+        return socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    return socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+
+
+class ReceiverDaemon:
+    def __init__(self, address, arm=None, security_manager=None, workers=4, queue_size=256):
+        self.address = address
+        self.arm = arm or RoboticArm()
+        self.sm = security_manager or SecurityManager(public_only=True)  # verify-only
+        # Session ids this daemon has accepted; a resent handshake is rejected.
+        self.sessions = SessionCache()
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.stats = {name: StageStats() for name in ('verify_decrypt', 'queue_wait', 'apply', 'total')}
+        self.applied = 0
+        self.rejected = 0
+        self._rejected_lock = threading.Lock()  # bumped from connection and apply threads
+        self._connections = {}  # open socket -> its connection thread
+        self._connections_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='receiver-crypto')
+        self._server = None
+        self._threads = []
+        self._stopping = threading.Event()
+
+    # --- lifecycle ---
+    def start(self):
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)
+        self._server = _make_socket(self.address)
+        if not isinstance(self.address, str):
+            self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind(self.address)
+        self._server.listen()
+        self.address = self._server.getsockname()
+        for target in (self._accept_loop, self._apply_loop):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Receiver daemon listening on {self.address}")
+        return self
+
+    def stop(self):
+        self._stopping.set()
+        if self._server is not None:
+            self._server.close()
+        # Unblock and finish the connection threads before the crypto pool
+        # goes away, so none of them submits to a shut-down pool.
+        with self._connections_lock:
+            connections = list(self._connections.items())
+        for conn, _ in connections:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        for _, thread in connections:
+            thread.join(timeout=5)
+        self.queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._pool.shutdown(wait=True)
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)
+        logger.info(f"Receiver daemon stopped: {self.applied} applied, {self.rejected} rejected")
+
+    def serve_forever(self):
+        self.start()
+        try:
+            while not self._stopping.wait(1.0):
+                pass
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def join(self, timeout=None):
+        """Wait until every connection has closed and its commands are applied."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._connections or self.queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.001)
+        return True
+
+    def metrics(self):
+        return {name: stats.summary() for name, stats in self.stats.items()}
+
+    # --- stages ---
+    def _accept_loop(self):
+        while not self._stopping.is_set():
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                return
+            thread = threading.Thread(target=self._connection_loop, args=(conn,), daemon=True)
+            with self._connections_lock:
+                self._connections[conn] = thread
+            thread.start()
+
+    def _connection_loop(self, conn):
+        try:
+            self._read_stream(conn)
+        finally:
+            conn.close()
+            with self._connections_lock:
+                self._connections.pop(conn, None)
+
+    def _read_stream(self, conn):
+        try:
+            handshake = recv_message(conn)
+            signature = recv_message(conn)
+            if handshake is None or signature is None:
+                return
+            stream = self.sm.accept_stream(handshake, signature, sessions=self.sessions)
+        except StreamError as e:
+            logger.warning(f"Rejected stream: {e}")
+            self._reject()
+            return
+        except RuntimeError as e:
+            # Key setup problem (e.g. no public_key.pem); refuse the stream
+            # but keep the daemon serving.
+            logger.error(f"Cannot verify stream: {e}")
+            self._reject()
+            return
+        while not self._stopping.is_set():
+            try:
+                frame = recv_message(conn)
+            except (OSError, StreamError) as e:
+                logger.warning(f"Connection dropped: {e}")
+                return
+            if frame is None:
+                return
+            received = time.perf_counter()
+            try:
+                future = self._pool.submit(self._verify_decrypt, stream, frame)
+            except RuntimeError:  # the pool shut down while stop() was waiting for us
+                return
+            # Blocks when the queue is full; that is the backpressure.
+            self.queue.put((stream, future, received))
+
+    def _reject(self):
+        with self._rejected_lock:
+            self.rejected += 1
+
+    def _verify_decrypt(self, stream, frame):
+        start = time.perf_counter()
+        seq, payload = stream.authenticate(frame)
+        params = decode_message(self.sm.fernet.decrypt(payload))
+        self.stats['verify_decrypt'].add(time.perf_counter() - start)
+        return seq, params, time.perf_counter()
+
+    def _apply_loop(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                return
+            stream, future, received = item
+            try:
+                seq, params, ready = future.result()
+                # Sequence checks happen here, in arrival order, so replays
+                # are caught even though frames are verified concurrently.
+                stream.check_sequence(seq)
+                self.stats['queue_wait'].add(time.perf_counter() - ready)
+                start = time.perf_counter()
+                command_from_params(params).execute(self.arm)
+                now = time.perf_counter()
+                self.stats['apply'].add(now - start)
+                self.stats['total'].add(now - received)
+                self.applied += 1
+            except Exception as e:
+                self._reject()
+                logger.warning(f"Rejected frame: {e}")
+            finally:
+                self.queue.task_done()
+
+
+class LoopbackSender:
+    """Test client that streams commands to a ReceiverDaemon."""
+
+    def __init__(self, address, security_manager=None):
+        self.sm = security_manager or SecurityManager()
+        self.stream = self.sm.open_stream()
+        self.sock = _make_socket(address)
+        self.sock.connect(address)
+        send_message(self.sock, self.stream.handshake)
+        send_message(self.sock, self.stream.handshake_signature)
+
+    def send(self, command):
+        payload = self.sm.fernet.encrypt(command.to_bytes())
+        send_message(self.sock, self.stream.seal(payload))
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the robotic arm command receiver.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', help="Listen on this Unix domain socket path instead of TCP")
+    parser.add_argument('--segments', type=int, default=3)
+    parser.add_argument('--length', type=float, default=50)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--queue-size', type=int, default=256)
+    parser.add_argument('--log-file', default='receiver_daemon.log')
+    parser.add_argument('--json-logs', action='store_true', help="Write JSON lines instead of text")
+    parser.add_argument('--log-rate', type=float, default=50,
+                        help="Records per second allowed from each INFO call site")
+    parser.add_argument('--metrics-port', type=int, help="Serve Prometheus metrics on this port")
+    parser.add_argument('--metrics-file', help="Write Prometheus metrics to this file at exit")
+    args = parser.parse_args()
+
+    configure_logging(args.log_file, json_lines=args.json_logs, rate_limit=args.log_rate)
+    if args.metrics_port or args.metrics_file:
+        metrics.enable(prometheus_path=args.metrics_file, port=args.metrics_port)
+    else:
+        metrics.enable_from_env()
+    address = args.unix or (args.host, args.port)
+    daemon = ReceiverDaemon(address, RoboticArm(args.segments, args.length),
+                            workers=args.workers, queue_size=args.queue_size)
+    daemon.serve_forever()
+    for name, summary in daemon.metrics().items():
+        print(f"{name:<15} n={summary['count']:<8} mean={summary['mean'] * 1e6:8.1f}us "
+              f"p99={summary['p99'] * 1e6:8.1f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,45 @@
 import logging
+import warnings
+from collections.abc import Mapping
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.widgets import TextBox
-import hashlib
-import secrets
-from cryptography.fernet import Fernet
-
-# Configure logging
-logging.basicConfig(
-    filename='robotic_arm.log',
-    level=logging.INFO,
-    format='%(asctime)s [%(levelname)s] %(message)s'
+# The arm model and commands live in the headless core; re-exported here so
+# existing ``from robotic_arm import ...`` imports keep working.
+from arm_core import (
+    IKResult, RoboticArm, Command, MoveCommand, PickUpCommand, PlaceCommand,
+    CommandExecutor, parse_command, command_from_params,
 )
+from crypto_session import CryptoSession
+from log_config import configure_logging
+from user_store import UserStore
+import metrics
+
 logger = logging.getLogger(__name__)
 
+# Operators live in a persistent SQLite store with scrypt hashes; it is
+# opened on first use so importing this module creates no files.
+_user_store = None
+
+def user_store(path='users.db'):
+    global _user_store
+    if _user_store is None:
+        _user_store = UserStore(path)
+    return _user_store
+
 class User:
-    def __init__(self, username, password, public_key=None, private_key=None):
+    """Handle for an operator in the user store.
+
+    Passwords are no longer held on the object; ``verify_password`` checks
+    them against the store. Passing ``password`` (the old in-memory API) is
+    deprecated: it registers the user in the store, and raises ValueError
+    if the name is already taken.
+    """
+    def __init__(self, username, password=None, public_key=None, private_key=None):
+        if password is not None:
+            warnings.warn("User(username, password) is deprecated; use User.register(username, password)",
+                          DeprecationWarning, stacklevel=2)
+            if not user_store().register(username, password):
+                raise ValueError(f"Username {username!r} already exists")
         self._username = username
-        self._password_hash = self._hash_password(password)
         self._public_key = public_key
         self._private_key = private_key
 
@@ -33,42 +55,49 @@ class User:
     def private_key(self):
         return self._private_key
 
-    def _hash_password(self, password):
-        salt = secrets.token_hex(16)
-        hash_ = hashlib.sha256((salt + password).encode()).hexdigest()
-        return f"{salt}${hash_}"
-
     def verify_password(self, password):
-        salt, hash_ = self._password_hash.split('$')
-        result = hashlib.sha256((salt + password).encode()).hexdigest() == hash_
-        logger.info(f"Password verification for user '{self._username}': {'success' if result else 'failure'}")
-        return result
+        return user_store().verify(self._username, password)
 
     @classmethod
     def register(cls, username, password):
+        """Add the user to the store; returns the User, or None if the name is taken."""
         logger.info(f"Registering user: {username}")
-        return cls(username, password, public_key="public_key_stub", private_key="private_key_stub")
+        if not user_store().register(username, password):
+            return None
+        return cls(username, public_key="public_key_stub", private_key="private_key_stub")
 
     @staticmethod
     def login(user, password):
         return user.verify_password(password)
 
-# Example user storage (in-memory for demo)
-user_db = {}
+class _UserDB(Mapping):
+    """Read-only ``username -> User`` view of the user store (formerly an in-memory dict)."""
+    def __getitem__(self, username):
+        if username not in user_store():
+            raise KeyError(username)
+        return User(username)
+
+    def __iter__(self):
+        return iter(user_store())
+
+    def __len__(self):
+        return len(user_store())
+
+user_db = _UserDB()
 
 def register_user(username, password):
-    if username in user_db:
-        logger.error(f"Registration failed: Username '{username}' already exists.")
+    user = User.register(username, password)
+    if user is None:
         print("Username already exists.")
         return None
-    user = User.register(username, password)
-    user_db[username] = user
-    logger.info(f"User '{username}' registered successfully.")
     print("Registration successful.")
     return user
 
 def login_gui():
     """GUI-based login function to authenticate the user with password masked as '*'."""
+    import matplotlib.pyplot as plt
+    from matplotlib.widgets import TextBox
+
     fig, ax = plt.subplots(figsize=(6, 6))
     ax.axis('off')
     plt.subplots_adjust(left=0.7, right=0.8, top=0.8, bottom=0.2)
@@ -98,11 +127,8 @@ def login_gui():
 
     login_status = {'authenticated': False}
 
-    def submit(event):
-        username = username_box.text
-        password = real_password['value']
-        user = user_db.get(username)
-        if user and User.login(user, password):
+    def finish_login(username, future):
+        if future.result():
             logger.info(f"User '{username}' logged in successfully.")
             print("Login successful!")
             login_status['authenticated'] = True
@@ -114,6 +140,22 @@ def login_gui():
             real_password['value'] = ""
             password_box.set_val("")
 
+    def submit(event):
+        username = username_box.text
+        password = real_password['value']
+        # The KDF runs on the store's thread pool; poll from the GUI thread
+        # so the window stays responsive while it works.
+        future = user_store().verify_async(username, password)
+        timer = fig.canvas.new_timer(interval=20)
+
+        def poll():
+            if future.done():
+                timer.stop()
+                finish_login(username, future)
+
+        timer.add_callback(poll)
+        timer.start()
+
     submit_button = plt.axes([0.4, 0.2, 0.2, 0.1])
     button = plt.Button(submit_button, 'Login')
     button.on_clicked(submit)
@@ -121,132 +163,23 @@ def login_gui():
     plt.show()
     return login_status['authenticated']
 
-# Register a default user for demonstration
-register_user("aaa", "aaa")
-
-class RoboticArm:
-    def __init__(self, num_segments=3, segment_length=50):
-        self.num_segments = num_segments
-        self.segment_length = segment_length
-        self.tolerance = 1e-2
-        self.joints = [np.array([i * segment_length, 0.0]) for i in range(num_segments + 1)]
-        self.clamped = False  # Track claw state: False = open, True = clamped
-        logger.info(f"RoboticArm initialized with {num_segments} segments, segment length {segment_length}")
-
-    def solve_ik(self, target):
-        joints = self.joints.copy()
-        dist = np.linalg.norm(joints[0] - target)
-        total_length = self.segment_length * self.num_segments
-
-        logger.info(f"Solving IK for target {target.tolist()} (distance: {dist:.2f})")
-        if dist > total_length:
-            for i in range(1, len(joints)):
-                r = np.linalg.norm(target - joints[i - 1])
-                lambda_ = self.segment_length / r
-                joints[i] = (1 - lambda_) * joints[i - 1] + lambda_ * target
-        else:
-            base = joints[0]
-            diff = np.linalg.norm(joints[-1] - target)
-            while diff > self.tolerance:
-                joints[-1] = target
-                for i in reversed(range(self.num_segments)):
-                    r = np.linalg.norm(joints[i + 1] - joints[i])
-                    lambda_ = self.segment_length / r
-                    joints[i] = (1 - lambda_) * joints[i + 1] + lambda_ * joints[i]
-                joints[0] = base
-                for i in range(self.num_segments):
-                    r = np.linalg.norm(joints[i + 1] - joints[i])
-                    lambda_ = self.segment_length / r
-                    joints[i + 1] = (1 - lambda_) * joints[i] + lambda_ * joints[i + 1]
-                diff = np.linalg.norm(joints[-1] - target)
-
-        self.joints = joints
-        logger.info(f"Arm moved to new position. End effector at {self.joints[-1].tolist()}")
-
-    def toggle_claw(self):
-        self.clamped = not self.clamped
-        logger.info(f"Claw {'clamped' if self.clamped else 'opened'}")
-
-    def draw(self, ax):
-        ax.clear()
-        ax.set_xlim(-300, 300)
-        ax.set_ylim(-300, 300)
-        ax.set_aspect('equal')
-
-        xs = [joint[0] for joint in self.joints]
-        ys = [joint[1] for joint in self.joints]
-        ax.plot(xs, ys, 'o-', linewidth=4, markersize=8, color='blue')
-
-        self.draw_claw(ax)
-
-        ax.set_title("2D Robotic Arm with Claw")
-        plt.draw()
-
-    def draw_claw(self, ax):
-        end = self.joints[-1]
-        prev = self.joints[-2]
-        direction = end - prev
-        length = np.linalg.norm(direction)
-        if length == 0:
-            return
-        unit_dir = direction / length
-
-        if self.clamped:
-            angle = np.deg2rad(10)
-            claw_len = 30
-            second_segment_len = 15
-        else:
-            angle = np.deg2rad(30)
-            claw_len = 45
-            second_segment_len = 30
-
-        rot_left = np.array([
-            [np.cos(angle), -np.sin(angle)],
-            [np.sin(angle),  np.cos(angle)]
-        ])
-        rot_right = np.array([
-            [np.cos(-angle), -np.sin(-angle)],
-            [np.sin(-angle),  np.cos(-angle)]
-        ])
-
-        claw_left_start = end
-        claw_left_end = end + rot_left @ unit_dir * claw_len
-
-        claw_right_start = end
-        claw_right_end = end + rot_right @ unit_dir * claw_len
-
-        def perp(v):
-            return np.array([-v[1], v[0]])
-
-        left_perp_dir = perp(claw_left_end - claw_left_start)
-        left_perp_dir /= np.linalg.norm(left_perp_dir)
-
-        right_perp_dir = perp(claw_right_end - claw_right_start)
-        right_perp_dir /= np.linalg.norm(right_perp_dir)
-
-        claw_left_second_end = claw_left_end + left_perp_dir * second_segment_len
-        claw_right_second_end = claw_right_end + right_perp_dir * second_segment_len
-
-        ax.plot([claw_left_start[0], claw_left_end[0]], [claw_left_start[1], claw_left_end[1]], color='red', linewidth=3)
-        ax.plot([claw_right_start[0], claw_right_end[0]], [claw_right_start[1], claw_right_end[1]], color='red', linewidth=3)
-
-        ax.plot([claw_left_end[0], claw_left_second_end[0]], [claw_left_end[1], claw_left_second_end[1]], color='red', linewidth=3)
-        ax.plot([claw_right_end[0], claw_right_second_end[0]], [claw_right_end[1], claw_right_second_end[1]], color='red', linewidth=3)
-
 def on_mouse_move(event):
     if event.xdata is not None and event.ydata is not None:
         target = np.array([event.xdata, event.ydata])
-        arm.solve_ik(target)
-        arm.draw(ax)
-        logger.info(f"Mouse moved: target set to {target.tolist()}")
+        # The renderer solves only the latest target once per frame.
+        renderer.request_target(target)
+        logger.info("Mouse moved: target set to (%.2f, %.2f)", event.xdata, event.ydata)
 
 def on_mouse_click(event):
     if event.button == 1:
         arm.toggle_claw()
-        arm.draw(ax)
+        renderer.invalidate()
         logger.info("Mouse click: claw toggled")
 
 def segment_input_gui():
+    import matplotlib.pyplot as plt
+    from matplotlib.widgets import TextBox
+
     fig, ax = plt.subplots(figsize=(4, 2))
     ax.axis('off')
     plt.subplots_adjust(left=0.3, right=0.7, top=0.8, bottom=0.2)
@@ -271,61 +204,21 @@ def segment_input_gui():
     plt.show()
     return input_status['value'] if input_status['value'] is not None else 3
 
-class Command:
-    def __init__(self, params, key=None):
-        self.params = params
-        self._key = key or Fernet.generate_key()
-        self._fernet = Fernet(self._key)
-
-    def encrypt(self):
-        data = str(self.params).encode()
-        encrypted = self._fernet.encrypt(data)
-        logger.info(f"Command encrypted: {self.params}")
-        return encrypted
-
-    def decrypt(self, token):
-        decrypted = self._fernet.decrypt(token)
-        logger.info(f"Command decrypted: {decrypted.decode()}")
-        return eval(decrypted.decode())
-
-    @property
-    def key(self):
-        return self._key
-
-class MoveCommand(Command):
-    def __init__(self, x, y, key=None):
-        params = {'action': 'move', 'x': x, 'y': y}
-        super().__init__(params, key)
-
-    def execute(self, robotic_arm):
-        logger.info(f"Executing MoveCommand to ({self.params['x']}, {self.params['y']})")
-        robotic_arm.solve_ik(np.array([self.params['x'], self.params['y']]))
-
-class PickUpCommand(Command):
-    def __init__(self, key=None):
-        params = {'action': 'pickup'}
-        super().__init__(params, key)
-
-    def execute(self, robotic_arm):
-        if not robotic_arm.clamped:
-            logger.info("Executing PickUpCommand (clamping claw)")
-            robotic_arm.toggle_claw()
-        else:
-            logger.info("PickUpCommand ignored: claw already clamped")
+if __name__ == "__main__":
+    import matplotlib.pyplot as plt
+    from matplotlib.widgets import TextBox
+    from arm_renderer import BlitRenderer
 
-class PlaceCommand(Command):
-    def __init__(self, key=None):
-        params = {'action': 'place'}
-        super().__init__(params, key)
+    # Log through a background thread into a rotating file; mouse and IK
+    # records are rate limited per call site.
+    configure_logging('robotic_arm.log', rate_limit=20)
+    # ROBOTIC_ARM_METRICS=1 turns on timing histograms (report printed at exit)
+    metrics.enable_from_env()
 
-    def execute(self, robotic_arm):
-        if robotic_arm.clamped:
-            logger.info("Executing PlaceCommand (opening claw)")
-            robotic_arm.toggle_claw()
-        else:
-            logger.info("PlaceCommand ignored: claw already open")
+    # Register a default user for demonstration (kept in users.db)
+    if "aaa" not in user_store():
+        register_user("aaa", "aaa")
 
-if __name__ == "__main__":
     if not login_gui():
         logger.error("Login failed. Exiting application.")
         exit()
@@ -335,12 +228,15 @@ if __name__ == "__main__":
     arm = RoboticArm(num_segments=num, segment_length=50)
 
     fig, ax = plt.subplots()
-    arm.draw(ax)
+    renderer = BlitRenderer(arm, ax)
 
     command_box = TextBox(plt.axes([0.15, 0.01, 0.5, 0.05]), 'Command:', initial="move 100 0")
     status_box = TextBox(plt.axes([0.68, 0.01, 0.3, 0.05]), 'Status:', initial="", color='.95')
     status_box.set_active(False)
 
+    # One key and cipher for every command typed in this session
+    session = CryptoSession()
+
     def handle_command(text):
         parts = command_box.text.strip().split()
         if not parts:
@@ -351,22 +247,22 @@ if __name__ == "__main__":
         try:
             if cmd == "move" and len(parts) == 3:
                 x, y = float(parts[1]), float(parts[2])
-                move_cmd = MoveCommand(x, y)
+                move_cmd = MoveCommand(x, y, session=session)
                 encrypted = move_cmd.encrypt()
                 params = move_cmd.decrypt(encrypted)
-                MoveCommand(params['x'], params['y']).execute(arm)
+                command_from_params(params, session=session).execute(arm)
                 status_box.set_val(f"Moved to ({x}, {y})")
             elif cmd == "pickup":
-                pickup_cmd = PickUpCommand()
+                pickup_cmd = PickUpCommand(session=session)
                 encrypted = pickup_cmd.encrypt()
                 params = pickup_cmd.decrypt(encrypted)
-                PickUpCommand().execute(arm)
+                command_from_params(params, session=session).execute(arm)
                 status_box.set_val("Picked up (claw closed)")
             elif cmd == "place":
-                place_cmd = PlaceCommand()
+                place_cmd = PlaceCommand(session=session)
                 encrypted = place_cmd.encrypt()
                 params = place_cmd.decrypt(encrypted)
-                PlaceCommand().execute(arm)
+                command_from_params(params, session=session).execute(arm)
                 status_box.set_val("Placed (claw opened)")
             else:
                 status_box.set_val("Unknown command or wrong parameters.")
@@ -374,12 +270,13 @@ if __name__ == "__main__":
         except Exception as e:
             status_box.set_val(f"Error: {e}")
             logger.error(f"Error handling command '{command_box.text}': {e}")
-        arm.draw(ax)
+        renderer.invalidate()
 
     command_box.on_submit(handle_command)
 
     cid_move = fig.canvas.mpl_connect('motion_notify_event', on_mouse_move)
     cid_click = fig.canvas.mpl_connect('button_press_event', on_mouse_click)
+    cid_close = fig.canvas.mpl_connect('close_event', lambda event: renderer.close())
 
     plt.show()
 
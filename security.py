@@ -1,26 +1,261 @@
+import hashlib
+import hmac
 import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives.asymmetric import rsa, padding
 from cryptography.hazmat.primitives import serialization, hashes
+import metrics
+
+SESSION_ID_SIZE = 16
+MAC_KEY_SIZE = 32
+TAG_SIZE = 32
+# session id | sequence number | payload length
+FRAME_HEADER = struct.Struct(f'<{SESSION_ID_SIZE}sQI')
+# Seconds a stream handshake stays acceptable after the sender created it.
+HANDSHAKE_TTL = 300
+# Frame count signed together with a batch's Merkle root.
+BATCH_COUNT = struct.Struct('<Q')
+
+
+class StreamError(Exception):
+    pass
+
+
+class SessionCache:
+    """Stream session ids accepted recently, so a captured handshake can't be replayed.
+
+    Ids only need remembering while their handshake is still within its
+    TTL; older ones are dropped, and at most ``max_entries`` are kept.
+    """
+
+    def __init__(self, max_entries=65536):
+        self.max_entries = max_entries
+        self._expiry = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, session_id, ttl=HANDSHAKE_TTL) -> bool:
+        """Record ``session_id``; returns False if it was already accepted."""
+        now = time.monotonic()
+        with self._lock:
+            while self._expiry and next(iter(self._expiry.values())) <= now:
+                self._expiry.popitem(last=False)
+            if session_id in self._expiry:
+                return False
+            self._expiry[session_id] = now + (ttl if ttl is not None else float('inf'))
+            while len(self._expiry) > self.max_entries:
+                self._expiry.popitem(last=False)
+        return True
+
+    def __len__(self):
+        return len(self._expiry)
+
+
+def merkle_root(frames) -> bytes:
+    """SHA-256 Merkle root over ``frames``.
+
+    An odd node is promoted to the next level unchanged rather than paired
+    with itself, so appending a copy of the last frame changes the root
+    (the duplicate-leaf ambiguity of CVE-2012-2459).
+    """
+    level = [hashlib.sha256(b'\x00' + frame).digest() for frame in frames]
+    if not level:
+        return hashlib.sha256(b'').digest()
+    while len(level) > 1:
+        paired = [hashlib.sha256(b'\x01' + level[i] + level[i + 1]).digest()
+                  for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            paired.append(level[-1])
+        level = paired
+    return level[0]
+
+
+def _batch_digest(frames) -> bytes:
+    # The signed value binds the frame count as well as the root.
+    frames = list(frames)
+    return BATCH_COUNT.pack(len(frames)) + merkle_root(frames)
+
+
+# --- PROCESS-WIDE KEY CACHE ---
+# Keys are read (or generated) once per process and shared by every
+# SecurityManager, so building one is cheap after the first.
+_key_cache = {}
+_key_locks = {}
+_key_cache_lock = threading.Lock()
+_loader = None
+
+
+def _cached(kind, path, load):
+    cache_key = (kind, os.path.abspath(path))
+    with _key_cache_lock:
+        if cache_key in _key_cache:
+            return _key_cache[cache_key]
+        lock = _key_locks.setdefault(cache_key, threading.Lock())
+    with lock:  # one loader per key; others wait for its result
+        if cache_key not in _key_cache:
+            _key_cache[cache_key] = load(path)
+        return _key_cache[cache_key]
+
+
+def clear_key_cache():
+    with _key_cache_lock:
+        _key_cache.clear()
+
+
+def _background(func, *args):
+    global _loader
+    with _key_cache_lock:
+        if _loader is None:
+            _loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix='key-loader')
+    return _loader.submit(func, *args)
+
+
+def _read_source(source) -> bytes:
+    """Key material from bytes or an open file descriptor."""
+    if isinstance(source, int):
+        with os.fdopen(source, "rb", closefd=False) as f:
+            return f.read()
+    return bytes(source)
+
+
+def _load_or_create_fernet_key(key_path):
+    if os.path.exists(key_path):
+        with open(key_path, "rb") as f:
+            return f.read()
+    key = Fernet.generate_key()
+    with open(key_path, "wb") as f:
+        f.write(key)
+    return key
+
+
+def _load_or_create_private_key(key_path, public_key_path):
+    if os.path.exists(key_path):
+        with open(key_path, "rb") as f:
+            private_key = serialization.load_pem_private_key(
+                f.read(),
+                password=None
+            )
+        # Older installs only have the private key; publish the public half
+        # so verify-only receivers (which never read this file) can start.
+        if not os.path.exists(public_key_path):
+            _write_public_key(private_key.public_key(), public_key_path)
+        return private_key
+    private_key = rsa.generate_private_key(
+        public_exponent=65537,
+        key_size=2048
+    )
+    with open(key_path, "wb") as f:
+        f.write(private_key.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption()
+        ))
+    _write_public_key(private_key.public_key(), public_key_path)
+    return private_key
+
+
+def _write_public_key(public_key, public_key_path):
+    with open(public_key_path, "wb") as f:
+        f.write(public_key.public_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PublicFormat.SubjectPublicKeyInfo
+        ))
+
+
+def _load_public_key(public_key_path, private_key_path, public_only):
+    if os.path.exists(public_key_path):
+        with open(public_key_path, "rb") as f:
+            return serialization.load_pem_public_key(f.read())
+    if public_only:
+        # A verify-only receiver must never read or create a private key;
+        # a freshly generated one could not verify the sender anyway.
+        raise RuntimeError(f"Public key {public_key_path!r} not found; copy the sender's public_key.pem "
+                           f"here or pass public_key= to SecurityManager")
+    # Loading (or creating) the private key writes public_key.pem as well.
+    private_key = _cached('private', private_key_path,
+                          lambda path: _load_or_create_private_key(path, public_key_path))
+    return private_key.public_key()
+
 
 class SecurityManager:
-    def __init__(self):
-        self.fernet_key = self._load_or_create_fernet_key()
-        self.fernet = Fernet(self.fernet_key)
-        self.private_key = self._load_or_create_private_key()
-        self.public_key = self.private_key.public_key()
+    """Symmetric encryption and RSA signatures with lazily loaded keys.
 
-    # --- SYMMETRIC ENCRYPTION ---
-    def _load_or_create_fernet_key(self):
-        key_path = "secret.key"
-        if os.path.exists(key_path):
-            with open(key_path, "rb") as f:
-                return f.read()
-        key = Fernet.generate_key()
-        with open(key_path, "wb") as f:
-            f.write(key)
-        return key
+    Keys come from ``secret.key``, ``private_key.pem`` and ``public_key.pem``
+    (created on first use) through a process-wide cache, and are only read
+    when first needed. ``fernet_key``, ``private_key`` and ``public_key``
+    may instead be given as bytes (raw Fernet key / PEM) or as an open file
+    descriptor. With ``public_only`` the private key is never loaded or
+    created, which is all a verify-only receiver needs; ``public_key.pem``
+    (or ``public_key``) must then exist, or verifying raises RuntimeError.
+    With ``background`` the private key
+    is loaded (or generated) on a worker thread straight away so it is ready
+    by the time the caller signs.
+    """
+
+    def __init__(self, fernet_key=None, private_key=None, public_key=None, public_only=False,
+                 background=False, key_path="secret.key", private_key_path="private_key.pem",
+                 public_key_path="public_key.pem"):
+        self.public_only = public_only
+        self.key_path = key_path
+        self.private_key_path = private_key_path
+        self.public_key_path = public_key_path
+        self._fernet_key = _read_source(fernet_key) if fernet_key is not None else None
+        self._fernet = None
+        self._private_key = None
+        self._public_key = None
+        self._private_future = None
+        self.sessions = SessionCache()
+        if private_key is not None:
+            self._private_key = serialization.load_pem_private_key(_read_source(private_key), password=None)
+        if public_key is not None:
+            self._public_key = serialization.load_pem_public_key(_read_source(public_key))
+        if background and not public_only and self._private_key is None:
+            self._private_future = _background(self._load_private_key)
+
+    # --- KEYS ---
+    @property
+    def fernet_key(self):
+        if self._fernet_key is None:
+            self._fernet_key = _cached('fernet', self.key_path, _load_or_create_fernet_key)
+        return self._fernet_key
+
+    @property
+    def fernet(self):
+        if self._fernet is None:
+            self._fernet = Fernet(self.fernet_key)
+        return self._fernet
+
+    def _load_private_key(self):
+        return _cached('private', self.private_key_path,
+                       lambda path: _load_or_create_private_key(path, self.public_key_path))
 
+    @property
+    def private_key(self):
+        if self._private_key is None:
+            if self.public_only:
+                raise RuntimeError("SecurityManager is in public-key-only mode and cannot sign")
+            if self._private_future is not None:
+                self._private_key = self._private_future.result()
+            else:
+                self._private_key = self._load_private_key()
+        return self._private_key
+
+    @property
+    def public_key(self):
+        if self._public_key is None:
+            if self._private_key is not None:
+                self._public_key = self._private_key.public_key()
+            else:
+                self._public_key = _cached('public', self.public_key_path,
+                                           lambda path: _load_public_key(path, self.private_key_path,
+                                                                         self.public_only))
+        return self._public_key
+
+    # --- SYMMETRIC ENCRYPTION ---
     def encrypt(self, data: str) -> bytes:
         return self.fernet.encrypt(data.encode())
 
@@ -28,50 +263,80 @@ class SecurityManager:
         return self.fernet.decrypt(encrypted_data).decode()
 
     # --- ASYMMETRIC (RSA) SIGNATURES ---
-    def _load_or_create_private_key(self):
-        key_path = "private_key.pem"
-        if os.path.exists(key_path):
-            with open(key_path, "rb") as f:
-                return serialization.load_pem_private_key(
-                    f.read(),
-                    password=None
-                )
-        private_key = rsa.generate_private_key(
-            public_exponent=65537,
-            key_size=2048
-        )
-        with open(key_path, "wb") as f:
-            f.write(private_key.private_bytes(
-                encoding=serialization.Encoding.PEM,
-                format=serialization.PrivateFormat.PKCS8,
-                encryption_algorithm=serialization.NoEncryption()
-            ))
-        return private_key
-
     def sign(self, data: str) -> bytes:
-        return self.private_key.sign(
-            data.encode(),
-            padding.PSS(
-                mgf=padding.MGF1(hashes.SHA256()),
-                salt_length=padding.PSS.MAX_LENGTH
-            ),
-            hashes.SHA256()
-        )
+        return self.sign_bytes(data.encode())
 
     def verify(self, data: str, signature: bytes) -> bool:
-        try:
-            self.public_key.verify(
-                signature,
-                data.encode(),
+        return self.verify_bytes(data.encode(), signature)
+
+    def sign_bytes(self, data: bytes) -> bytes:
+        with metrics.timer(metrics.SIGN_SECONDS):
+            return self.private_key.sign(
+                data,
                 padding.PSS(
                     mgf=padding.MGF1(hashes.SHA256()),
                     salt_length=padding.PSS.MAX_LENGTH
                 ),
                 hashes.SHA256()
             )
-            return True
+
+    def verify_bytes(self, data: bytes, signature: bytes) -> bool:
+        public_key = self.public_key  # a missing key is an error, not a bad signature
+        with metrics.timer(metrics.VERIFY_SECONDS):
+            try:
+                public_key.verify(
+                    signature,
+                    data,
+                    padding.PSS(
+                        mgf=padding.MGF1(hashes.SHA256()),
+                        salt_length=padding.PSS.MAX_LENGTH
+                    ),
+                    hashes.SHA256()
+                )
+                return True
+            except Exception:
+                return False
+
+    # --- STREAMING (one RSA handshake, HMAC per frame) ---
+    def open_stream(self) -> "StreamSender":
+        """Start a command stream. Send ``sender.handshake`` to the receiver first."""
+        return StreamSender(self)
+
+    def accept_stream(self, handshake: bytes, signature: bytes, ttl=HANDSHAKE_TTL, sessions=None) -> "StreamReceiver":
+        """Verify a live stream handshake and return a receiver for its frames.
+
+        Handshakes older than ``ttl`` seconds are rejected, as are session ids
+        already recorded in ``sessions`` (default: this manager's
+        SessionCache), so a recorded connection cannot be replayed.
+        """
+        receiver = self._open_handshake(handshake, signature, ttl)
+        if sessions is None:
+            sessions = self.sessions
+        if not sessions.add(receiver.session_id, ttl):
+            raise StreamError("Replayed stream handshake")
+        return receiver
+
+    def accept_recorded_stream(self, handshake: bytes, signature: bytes) -> "StreamReceiver":
+        """Verify a stored handshake (e.g. from a command log) with no age or reuse check."""
+        return self._open_handshake(handshake, signature, None)
+
+    def _open_handshake(self, handshake, signature, ttl):
+        if not self.verify_bytes(handshake, signature):
+            raise StreamError("Stream handshake signature is invalid")
+        try:
+            secret = self.fernet.decrypt(handshake, ttl=ttl)
         except Exception:
-            return False
+            raise StreamError("Stream handshake could not be decrypted or has expired") from None
+        if len(secret) != SESSION_ID_SIZE + MAC_KEY_SIZE:
+            raise StreamError("Malformed stream handshake")
+        return StreamReceiver(secret[:SESSION_ID_SIZE], secret[SESSION_ID_SIZE:])
+
+    def sign_batch(self, frames) -> bytes:
+        """RSA-sign the frame count and Merkle root of a batch of frames."""
+        return self.sign_bytes(_batch_digest(frames))
+
+    def verify_batch(self, frames, signature: bytes) -> bool:
+        return self.verify_bytes(_batch_digest(frames), signature)
 
     def get_public_key_pem(self):
         return self.public_key.public_bytes(
@@ -79,6 +344,67 @@ class SecurityManager:
             format=serialization.PublicFormat.SubjectPublicKeyInfo
         )
 
+class StreamSender:
+    """Seals frames for one stream session.
+
+    The RSA signature is paid once, on ``handshake`` (which carries the
+    session id and a fresh MAC key encrypted under the shared Fernet key).
+    Every frame after that is authenticated with HMAC-SHA256 over its
+    session id, sequence number and payload. Payloads are not encrypted;
+    pass ciphertext if they need to stay confidential.
+    """
+
+    def __init__(self, security_manager):
+        self.session_id = os.urandom(SESSION_ID_SIZE)
+        self._mac_key = os.urandom(MAC_KEY_SIZE)
+        self.handshake = security_manager.fernet.encrypt(self.session_id + self._mac_key)
+        self.handshake_signature = security_manager.sign_bytes(self.handshake)
+        self._seq = 0
+
+    def seal(self, payload: bytes) -> bytes:
+        self._seq += 1
+        header = FRAME_HEADER.pack(self.session_id, self._seq, len(payload))
+        tag = hmac.new(self._mac_key, header + payload, hashlib.sha256).digest()
+        return header + payload + tag
+
+
+class StreamReceiver:
+    """Checks frames from one stream session and rejects replays."""
+
+    def __init__(self, session_id, mac_key):
+        self.session_id = session_id
+        self._mac_key = mac_key
+        self.last_seq = 0
+
+    def open(self, frame: bytes) -> bytes:
+        """Return the payload of ``frame`` or raise StreamError."""
+        seq, payload = self.authenticate(frame)
+        self.check_sequence(seq)
+        return payload
+
+    def authenticate(self, frame: bytes):
+        """Check a frame's MAC and return (seq, payload) without the replay check.
+
+        Safe to call from several threads; callers that split work this way
+        must pass the sequence numbers to ``check_sequence`` in order.
+        """
+        if len(frame) < FRAME_HEADER.size + TAG_SIZE:
+            raise StreamError("Truncated frame")
+        session_id, seq, length = FRAME_HEADER.unpack_from(frame)
+        if FRAME_HEADER.size + length + TAG_SIZE != len(frame):
+            raise StreamError("Frame length mismatch")
+        body, tag = frame[:-TAG_SIZE], frame[-TAG_SIZE:]
+        expected = hmac.new(self._mac_key, body, hashlib.sha256).digest()
+        if not hmac.compare_digest(tag, expected) or session_id != self.session_id:
+            raise StreamError("Frame authentication failed")
+        return seq, body[FRAME_HEADER.size:]
+
+    def check_sequence(self, seq: int):
+        if seq <= self.last_seq:
+            raise StreamError(f"Replayed or out-of-order frame {seq} (last {self.last_seq})")
+        self.last_seq = seq
+
+
 # Test block (optional)
 if __name__ == "__main__":
     sm = SecurityManager()
@@ -88,3 +414,24 @@ if __name__ == "__main__":
     print("Decrypted:", sm.decrypt(enc))
     sig = sm.sign(msg)
     print("Signature valid?", sm.verify(msg, sig))
+    sender = sm.open_stream()
+    receiver = sm.accept_stream(sender.handshake, sender.handshake_signature)
+    frames = [sender.seal(f"frame {i}".encode()) for i in range(3)]
+    print("Stream payloads:", [receiver.open(frame) for frame in frames])
+    print("Batch signature valid?", sm.verify_batch(frames, sm.sign_batch(frames)))
+    # Regression: a signed batch must not verify with its last frame repeated.
+    assert not sm.verify_batch(frames + [frames[-1]], sm.sign_batch(frames)), "extended batch verified"
+    print("Extended batch rejected")
+    # Regression: resending a recorded handshake must not open a second session.
+    try:
+        sm.accept_stream(sender.handshake, sender.handshake_signature)
+        raise AssertionError("replayed handshake was accepted")
+    except StreamError as e:
+        print("Replayed handshake rejected:", e)
+    stale = sm.fernet.encrypt_at_time(os.urandom(SESSION_ID_SIZE + MAC_KEY_SIZE),
+                                      int(time.time()) - 2 * HANDSHAKE_TTL)
+    try:
+        sm.accept_stream(stale, sm.sign_bytes(stale))
+        raise AssertionError("expired handshake was accepted")
+    except StreamError as e:
+        print("Expired handshake rejected:", e)
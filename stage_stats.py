@@ -0,0 +1,46 @@
+"""Always-on latency samples for the stages of a command pipeline.
+
+Used by the receiver daemon and the asyncio pipeline; unlike the opt-in
+histograms in ``metrics``, each stage keeps a bounded window of raw samples
+so percentiles are exact over recent traffic. Stages may be recorded from
+several worker threads at once.
+"""
+import threading
+from collections import deque
+
+
+class StageStats:
+    """Latency samples for one pipeline stage (seconds)."""
+
+    def __init__(self, window=10000):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+            self._samples.append(seconds)
+
+    @staticmethod
+    def _percentile(ordered, q):
+        if not ordered:
+            return 0.0
+        return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+    def percentile(self, q):
+        with self._lock:
+            ordered = sorted(self._samples)
+        return self._percentile(ordered, q)
+
+    def summary(self):
+        with self._lock:
+            count, total, max_, ordered = self.count, self.total, self.max, sorted(self._samples)
+        mean = total / count if count else 0.0
+        return {'count': count, 'mean': mean, 'p50': self._percentile(ordered, 50),
+                'p99': self._percentile(ordered, 99), 'max': max_}
@@ -0,0 +1,60 @@
+import numpy as np
+
+LINEAR = 'linear'
+SPLINE = 'spline'
+
+
+class TrajectoryFrame:
+    """One control tick of RoboticArm.move_along."""
+
+    __slots__ = ('t', 'target', 'joints', 'result')
+
+    def __init__(self, t, target, joints, result):
+        self.t = t
+        self.target = target
+        self.joints = joints
+        self.result = result
+
+
+def catmull_rom(waypoints, subdivisions=16):
+    """Densify ``waypoints`` with a uniform Catmull-Rom spline through every waypoint."""
+    points = np.asarray(waypoints, dtype=float)
+    if len(points) < 3:
+        return points
+    padded = np.vstack([2 * points[0] - points[1], points, 2 * points[-1] - points[-2]])
+    s = np.linspace(0.0, 1.0, subdivisions, endpoint=False)[:, None]
+    s2, s3 = s * s, s * s * s
+    pieces = []
+    for i in range(len(points) - 1):
+        p0, p1, p2, p3 = padded[i:i + 4]
+        pieces.append(0.5 * (2 * p1 + (p2 - p0) * s + (2 * p0 - 5 * p1 + 4 * p2 - p3) * s2
+                             + (3 * p1 - p0 - 3 * p2 + p3) * s3))
+    pieces.append(points[-1:])
+    return np.vstack(pieces)
+
+
+def sample_path(waypoints, dt, speed, kind=LINEAR):
+    """Resample a path at a fixed control rate.
+
+    Returns an (M, 2) array of targets spaced ``speed * dt`` apart along the
+    path's arc length, starting at the first waypoint and ending exactly on
+    the last one.
+    """
+    if dt <= 0 or speed <= 0:
+        raise ValueError("dt and speed must be positive")
+    if kind == SPLINE:
+        points = catmull_rom(waypoints)
+    elif kind == LINEAR:
+        points = np.asarray(waypoints, dtype=float)
+    else:
+        raise ValueError(f"Unknown path kind {kind!r}; expected '{LINEAR}' or '{SPLINE}'")
+    if points.ndim != 2 or points.shape[1] != 2 or len(points) == 0:
+        raise ValueError("waypoints must be a non-empty sequence of (x, y) points")
+
+    arc = np.concatenate([[0.0], np.cumsum(np.linalg.norm(np.diff(points, axis=0), axis=1))])
+    if arc[-1] == 0:
+        return points[:1].copy()
+    stations = np.arange(0.0, arc[-1], speed * dt)
+    stations = np.append(stations, arc[-1]) if stations[-1] < arc[-1] else stations
+    return np.column_stack([np.interp(stations, arc, points[:, 0]),
+                            np.interp(stations, arc, points[:, 1])])
@@ -0,0 +1,152 @@
+"""Persistent operator credentials.
+
+Users live in a SQLite table keyed (and therefore indexed) by username, so
+the store survives restarts and lookups stay O(log n) with many operators.
+Passwords are hashed with scrypt, a memory-hard KDF; each row keeps its own
+salt and cost parameters, so the defaults can be raised later and old rows
+are re-hashed on their next successful login. Digests are compared with
+``hmac.compare_digest``, and unknown users still pay for one KDF run so the
+response time does not reveal which usernames exist.
+
+scrypt releases the GIL, so ``verify_async`` / ``register_async`` run the
+KDF on a thread pool and a login burst uses every core without blocking the
+GUI or the daemon's accept loop.
+"""
+import hashlib
+import hmac
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# scrypt cost: N=2**14, r=8 uses 16 MiB and ~50 ms per hash on a laptop core.
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SALT_SIZE = 16
+KEY_SIZE = 32
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    salt BLOB NOT NULL,
+    n INTEGER NOT NULL,
+    r INTEGER NOT NULL,
+    p INTEGER NOT NULL,
+    hash BLOB NOT NULL,
+    created REAL NOT NULL
+) WITHOUT ROWID
+"""
+
+
+def hash_password(password, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P, salt=None):
+    """Return ``(salt, digest)`` for ``password`` under the given scrypt cost."""
+    salt = salt if salt is not None else os.urandom(SALT_SIZE)
+    digest = hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                            maxmem=256 * n * r + 1024 * 1024, dklen=KEY_SIZE)
+    return salt, digest
+
+
+def check_password(password, salt, n, r, p, digest):
+    return hmac.compare_digest(hash_password(password, n, r, p, salt)[1], digest)
+
+
+class UserStore:
+    """SQLite-backed user table with scrypt hashes.
+
+    ``path`` may be ``':memory:'`` for a throwaway store. ``n``, ``r`` and
+    ``p`` are the scrypt parameters for new hashes; ``workers`` sizes the
+    KDF thread pool (default: one per CPU).
+    """
+
+    def __init__(self, path='users.db', n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P, workers=None):
+        self.path = path
+        self.n, self.r, self.p = n, r, p
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ':memory:':
+            self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(_SCHEMA)
+        self._lock = threading.Lock()  # the connection is shared; KDF work runs outside it
+        self._pool = ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1,
+                                        thread_name_prefix='user-store-kdf')
+        self._dummy = hash_password('', n, r, p)
+
+    def _row(self, username):
+        with self._lock:
+            return self._db.execute("SELECT salt, n, r, p, hash FROM users WHERE username = ?",
+                                    (username,)).fetchone()
+
+    def __contains__(self, username):
+        return self._row(username) is not None
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def __iter__(self):
+        """Iterate over usernames in sorted order."""
+        with self._lock:
+            rows = self._db.execute("SELECT username FROM users ORDER BY username").fetchall()
+        return (username for username, in rows)
+
+    def register(self, username, password):
+        """Add a user; returns False if the username is taken."""
+        salt, digest = hash_password(password, self.n, self.r, self.p)
+        try:
+            with self._lock:
+                self._db.execute("INSERT INTO users VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                 (username, salt, self.n, self.r, self.p, digest, time.time()))
+        except sqlite3.IntegrityError:
+            logger.error("Registration failed: username %r already exists", username)
+            return False
+        logger.info("User %r registered", username)
+        return True
+
+    def verify(self, username, password):
+        """Return True if ``password`` is correct for ``username``."""
+        row = self._row(username)
+        if row is None:
+            # Same KDF cost as a real user so timing does not leak existence.
+            check_password(password, self._dummy[0], self.n, self.r, self.p, self._dummy[1])
+            logger.warning("Failed login for unknown user %r", username)
+            return False
+        salt, n, r, p, digest = row
+        ok = check_password(password, salt, n, r, p, digest)
+        if ok and (n, r, p) != (self.n, self.r, self.p):
+            self._rehash(username, password)
+        logger.info("Password verification for user %r: %s", username, 'success' if ok else 'failure')
+        return ok
+
+    def _rehash(self, username, password):
+        salt, digest = hash_password(password, self.n, self.r, self.p)
+        with self._lock:
+            self._db.execute("UPDATE users SET salt = ?, n = ?, r = ?, p = ?, hash = ? WHERE username = ?",
+                             (salt, self.n, self.r, self.p, digest, username))
+        logger.info("Re-hashed user %r with current scrypt parameters", username)
+
+    def delete(self, username):
+        with self._lock:
+            return self._db.execute("DELETE FROM users WHERE username = ?", (username,)).rowcount > 0
+
+    def register_async(self, username, password):
+        """``register`` on the KDF pool; returns a Future."""
+        return self._pool.submit(self.register, username, password)
+
+    def verify_async(self, username, password):
+        """``verify`` on the KDF pool; returns a Future."""
+        return self._pool.submit(self.verify, username, password)
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
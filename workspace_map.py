@@ -0,0 +1,247 @@
+"""Reachability and solver-cost maps of an arm's workspace.
+
+``sweep`` solves IK at the centre of every cell of a regular grid over a
+region (by default the ±300 ``draw`` viewport) and writes one ``CELL_DTYPE`` record
+per cell to a ``.npy`` file that is memory-mapped, never held in memory:
+reachability, iteration count, final error and convergence. Reachable
+cells that did not converge are the solver's blind spots.
+
+Rows are split into chunks of about ``chunk_points`` cells. Each chunk is
+solved by a worker process, which writes its rows straight into the
+memory-mapped file; at most ``2 * workers`` chunks are queued at a time.
+Memory use therefore depends on the chunk size, not the grid size, and
+grids of millions of points are fine.
+
+Two solvers are available. ``'batch'`` (the default) runs ``batch_ik``
+from the rest pose: closed form for one- and two-segment arms, as
+``solve_ik`` does, and vectorized FABRIK otherwise. ``'scalar'`` calls
+``RoboticArm.solve_ik`` per cell (analytic one- and two-segment solves,
+optional ``constraints``) and also records its wall time.
+
+    python workspace_map.py --segments 3 --shape 2000 2000 --output ws.npy --heatmap ws.png
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from arm_core import RoboticArm
+from batch_ik import solve_ik_batch
+
+logger = logging.getLogger(__name__)
+
+VIEWPORT = (-300.0, 300.0, -300.0, 300.0)
+BATCH = 'batch'
+SCALAR = 'scalar'
+
+# 16 bytes per cell.
+CELL_DTYPE = np.dtype([
+    ('reachable', '?'),
+    ('converged', '?'),
+    ('iterations', '<u2'),
+    ('error', '<f4'),
+    ('elapsed', '<f4'),  # seconds per solve; scalar solver only
+    ('binding', '<u4'),  # number of binding constraints; scalar solver only
+])
+
+FIELDS = ('status', 'iterations', 'error', 'elapsed')
+
+
+def _axes(region, shape):
+    # Cell centres, so the cells tile ``region`` exactly (and match the
+    # heatmap's extent).
+    xmin, xmax, ymin, ymax = region
+    ny, nx = shape
+    return (xmin + (np.arange(nx) + 0.5) * (xmax - xmin) / nx,
+            ymin + (np.arange(ny) + 0.5) * (ymax - ymin) / ny)
+
+
+def _solve_rows(path, row_start, row_stop, spec):
+    """Worker entry point: solve grid rows ``row_start:row_stop`` into the map file."""
+    logging.disable(logging.WARNING)
+    xs, ys = _axes(spec['region'], spec['shape'])
+    cells = np.load(path, mmap_mode='r+')
+    try:
+        gx, gy = np.meshgrid(xs, ys[row_start:row_stop])
+        targets = np.column_stack([gx.ravel(), gy.ravel()])
+        out = np.zeros(len(targets), dtype=CELL_DTYPE)
+        if spec['solver'] == BATCH:
+            result = solve_ik_batch(targets, spec['num_segments'], spec['segment_length'],
+                                    tolerance=spec['tolerance'], max_iterations=spec['max_iterations'])
+            out['reachable'] = result.reachable
+            out['converged'] = result.converged
+            out['iterations'] = np.minimum(result.iterations, np.iinfo(np.uint16).max)
+            out['error'] = result.error
+        else:
+            arm = RoboticArm(spec['num_segments'], spec['segment_length'],
+                             max_iterations=spec['max_iterations'], constraints=spec['constraints'])
+            arm.tolerance = spec['tolerance']
+            for i, target in enumerate(targets):
+                result = arm.solve_ik(target, warm_start=False)
+                out[i] = (result.reachable, result.converged, min(result.iterations, 65535),
+                          result.error, result.elapsed, len(result.binding))
+        cells[row_start:row_stop] = out.reshape(row_stop - row_start, len(xs))
+        cells.flush()
+        return (int(out['reachable'].sum()), int((out['reachable'] & ~out['converged']).sum()),
+                int(out['iterations'].sum(dtype=np.int64)))
+    finally:
+        del cells
+
+
+class WorkspaceMap:
+    """A finished sweep: memory-mapped cells plus the metadata sidecar (``<path>.json``)."""
+
+    def __init__(self, path, meta, mode='r'):
+        self.path = path
+        self.meta = meta
+        self.cells = np.load(path, mmap_mode=mode)
+
+    @classmethod
+    def open(cls, path):
+        with open(path + '.json') as f:
+            return cls(path, json.load(f))
+
+    @property
+    def region(self):
+        return tuple(self.meta['region'])
+
+    @property
+    def axes(self):
+        """(x, y) cell-centre coordinates; ``cells[j, i]`` is at (x[i], y[j])."""
+        return _axes(self.region, self.cells.shape)
+
+    def status(self, rows=slice(None), cols=slice(None)):
+        """0 = unreachable, 1 = converged, 2 = reachable but not converged."""
+        cells = self.cells[rows, cols]
+        return np.where(cells['converged'], 1, np.where(cells['reachable'], 2, 0)).astype(np.uint8)
+
+    def field(self, name, rows=slice(None), cols=slice(None)):
+        if name == 'status':
+            return self.status(rows, cols)
+        return np.asarray(self.cells[rows, cols][name])
+
+    def summary(self):
+        return self.meta.get('summary', {})
+
+    def heatmap(self, out, field='iterations', max_pixels=2000, dpi=100):
+        """Render ``field`` (status, iterations, error or elapsed) to an image file with Agg.
+
+        Grids larger than ``max_pixels`` on a side are subsampled by striding
+        the memory map, so only the pixels drawn are read.
+        """
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.colors import ListedColormap, LogNorm
+        from matplotlib.figure import Figure
+
+        if field not in FIELDS:
+            raise ValueError(f"field must be one of {FIELDS}, got {field!r}")
+        ny, nx = self.cells.shape
+        stride = max(1, -(-max(nx, ny) // max_pixels))
+        data = self.field(field, slice(None, None, stride), slice(None, None, stride))
+        figure = Figure(figsize=(7, 6), dpi=dpi)
+        FigureCanvasAgg(figure)
+        ax = figure.add_subplot()
+        xmin, xmax, ymin, ymax = self.region
+        options = dict(origin='lower', extent=(xmin, xmax, ymin, ymax), interpolation='nearest')
+        if field == 'status':
+            image = ax.imshow(data, cmap=ListedColormap(['#dddddd', '#4c9f50', '#d1495b']), vmin=0, vmax=2, **options)
+            bar = figure.colorbar(image, ax=ax, ticks=[1 / 3, 1, 5 / 3])
+            bar.ax.set_yticklabels(['unreachable', 'converged', 'not converged'])
+        else:
+            positive = data[data > 0]
+            norm = LogNorm(vmin=positive.min(), vmax=positive.max()) if positive.size else None
+            image = ax.imshow(np.ma.masked_less_equal(data, 0), cmap='viridis', norm=norm, **options)
+            figure.colorbar(image, ax=ax, label=field)
+        ax.set_title(f"{self.meta['num_segments']} x {self.meta['segment_length']:g} arm: {field} "
+                     f"({self.meta['solver']} solver, {nx} x {ny})")
+        ax.set_aspect('equal')
+        figure.savefig(out)
+        return out
+
+
+def sweep(path, num_segments, segment_length=50, region=VIEWPORT, shape=(600, 600), workers=None,
+          chunk_points=65536, solver=BATCH, max_iterations=1000, tolerance=1e-2, constraints=None):
+    """Solve every cell of a ``shape`` = (rows, cols) grid over ``region`` = (xmin, xmax, ymin, ymax).
+
+    Results are written to ``path`` (a .npy file) and a ``<path>.json``
+    sidecar; returns the WorkspaceMap.
+    """
+    if solver not in (BATCH, SCALAR):
+        raise ValueError(f"solver must be {BATCH!r} or {SCALAR!r}")
+    if constraints is not None and solver != SCALAR:
+        raise ValueError("constraints need the scalar solver")
+    ny, nx = shape
+    workers = workers or os.cpu_count() or 1
+    spec = {'num_segments': num_segments, 'segment_length': float(segment_length),
+            'region': [float(v) for v in region], 'shape': [ny, nx], 'solver': solver,
+            'max_iterations': max_iterations, 'tolerance': tolerance}
+    cells = np.lib.format.open_memmap(path, mode='w+', dtype=CELL_DTYPE, shape=(ny, nx))
+    del cells  # created and sized; workers map their own rows
+
+    rows_per_chunk = max(1, chunk_points // nx)
+    start = time.perf_counter()
+    reachable = blind = iterations = 0
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        def drain():
+            nonlocal reachable, blind, iterations
+            r, b, i = pending.popleft().result()
+            reachable += r
+            blind += b
+            iterations += i
+
+        for row in range(0, ny, rows_per_chunk):
+            pending.append(pool.submit(_solve_rows, path, row, min(row + rows_per_chunk, ny),
+                                       dict(spec, constraints=constraints)))
+            if len(pending) >= 2 * workers:
+                drain()
+        while pending:
+            drain()
+    elapsed = time.perf_counter() - start
+
+    total = nx * ny
+    spec['summary'] = {'cells': total, 'reachable': reachable, 'not_converged': blind,
+                       'mean_iterations': iterations / total, 'seconds': elapsed,
+                       'cells_per_second': total / elapsed if elapsed else 0.0, 'workers': workers,
+                       'constrained': constraints is not None}
+    with open(path + '.json', 'w') as f:
+        json.dump(spec, f, indent=2)
+    logger.info("Workspace sweep of %d cells took %.2fs (%d reachable, %d not converged)",
+                total, elapsed, reachable, blind)
+    return WorkspaceMap(path, spec)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Map reachability and IK cost over a grid.")
+    parser.add_argument('--segments', type=int, default=3)
+    parser.add_argument('--length', type=float, default=50)
+    parser.add_argument('--region', type=float, nargs=4, default=VIEWPORT,
+                        metavar=('XMIN', 'XMAX', 'YMIN', 'YMAX'))
+    parser.add_argument('--shape', type=int, nargs=2, default=(600, 600), metavar=('ROWS', 'COLS'))
+    parser.add_argument('--solver', choices=(BATCH, SCALAR), default=BATCH)
+    parser.add_argument('--max-iterations', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunk-points', type=int, default=65536)
+    parser.add_argument('--output', default='workspace.npy')
+    parser.add_argument('--heatmap', help="Also render a heatmap image here")
+    parser.add_argument('--field', choices=FIELDS, default='iterations', help="Heatmap field")
+    args = parser.parse_args()
+
+    workspace = sweep(args.output, args.segments, args.length, args.region, args.shape, args.workers,
+                      args.chunk_points, args.solver, args.max_iterations)
+    summary = workspace.summary()
+    print(f"{summary['cells']:,} cells in {summary['seconds']:.2f}s "
+          f"({summary['cells_per_second']:,.0f}/s on {summary['workers']} workers): "
+          f"{summary['reachable']:,} reachable, {summary['not_converged']:,} not converged, "
+          f"{summary['mean_iterations']:.2f} mean iterations")
+    if args.heatmap:
+        print("Heatmap written to", workspace.heatmap(args.heatmap, args.field))
+
+
+if __name__ == "__main__":
+    main()